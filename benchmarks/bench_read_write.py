@@ -0,0 +1,133 @@
+"""
+Mixed read/write throughput against SQLite, before and after read/write
+session routing.
+
+  before: rollback journal, reads and writes share the read-write engine
+  after:  WAL, writes on the read-write engine, reads on the read-only pool
+
+Run from the repository root:
+
+    python benchmarks/bench_read_write.py --threads 16 --seconds 5 --write-ratio 0.2
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func, insert
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from database import Base, create_read_engine, create_write_engine
+from models import Class, ClassMember, Quiz, QuizOption, QuizQuestion, QuizResponse, User
+
+
+def seed(write_engine, students: int, questions: int) -> dict:
+    Base.metadata.create_all(bind=write_engine)
+    with write_engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"id": 1, "email": "t@example.com", "password_hash": "x", "role": "teacher"}
+        ] + [
+            {"id": i + 2, "email": f"s{i}@example.com", "password_hash": "x", "role": "student"}
+            for i in range(students)
+        ])
+        conn.execute(insert(Class), [{"id": 1, "teacher_id": 1, "class_name": "Bench", "join_code": "BENCH1"}])
+        conn.execute(insert(ClassMember), [{"class_id": 1, "student_id": i + 2} for i in range(students)])
+        conn.execute(insert(Quiz), [{"id": 1, "class_id": 1, "title": "Bench", "status": "live"}])
+        conn.execute(insert(QuizQuestion), [
+            {"id": q + 1, "quiz_id": 1, "question_text": f"Q{q}", "correct_option_id": q * 2 + 1}
+            for q in range(questions)
+        ])
+        conn.execute(insert(QuizOption), [
+            {"id": q * 2 + o + 1, "question_id": q + 1, "option_text": str(o)}
+            for q in range(questions) for o in range(2)
+        ])
+    return {"students": students, "questions": questions}
+
+
+def run(read_factory, write_factory, shape: dict, threads: int, seconds: float, write_ratio: float) -> dict:
+    stats = {"reads": 0, "writes": 0, "errors": 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def worker(seed_value: int):
+        rng = random.Random(seed_value)
+        local = {"reads": 0, "writes": 0, "errors": 0}
+        while time.perf_counter() < deadline:
+            try:
+                if rng.random() < write_ratio:
+                    with write_factory() as db:
+                        q = rng.randrange(shape["questions"])
+                        db.add(QuizResponse(
+                            quiz_id=1,
+                            question_id=q + 1,
+                            student_id=rng.randrange(shape["students"]) + 2,
+                            option_id=q * 2 + 1 + rng.randrange(2),
+                        ))
+                        db.commit()
+                    local["writes"] += 1
+                else:
+                    with read_factory() as db:
+                        (
+                            db.query(QuizResponse.student_id, func.count(QuizResponse.id))
+                            .filter(QuizResponse.quiz_id == 1)
+                            .group_by(QuizResponse.student_id)
+                            .all()
+                        )
+                    local["reads"] += 1
+            except OperationalError:
+                local["errors"] += 1
+        with lock:
+            for k, v in local.items():
+                stats[k] += v
+
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+
+    return {k: v / seconds for k, v in stats.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    parser.add_argument("--students", type=int, default=500)
+    parser.add_argument("--questions", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for label in ("before", "after"):
+            path = os.path.join(tmp, f"{label}.db")
+            write_engine = create_write_engine(path, wal=(label == "after"))
+            shape = seed(write_engine, args.students, args.questions)
+
+            write_factory = sessionmaker(bind=write_engine, autoflush=False)
+            if label == "after":
+                read_engine = create_read_engine(path)
+                read_factory = sessionmaker(bind=read_engine, autoflush=False)
+            else:
+                read_engine = None
+                read_factory = write_factory
+
+            result = run(read_factory, write_factory, shape, args.threads, args.seconds, args.write_ratio)
+            print(
+                f"{label:>6}: reads/s={result['reads']:9.1f}  writes/s={result['writes']:8.1f}  "
+                f"errors/s={result['errors']:6.1f}"
+            )
+
+            write_engine.dispose()
+            if read_engine is not None:
+                read_engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Write throughput against SQLite with and without the group-commit writer.
+
+  direct: every worker thread commits its own transaction
+  queued: workers enqueue write units; one writer thread group-commits them
+
+Run from the repository root:
+
+    python benchmarks/bench_write_queue.py --seconds 5 --threads 1 4 16 64
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from database import Base, create_write_engine
+from models import Class, ClassMember, User
+from utils.write_queue import WriteQueue
+
+
+def seed(path: str):
+    engine = create_write_engine(path)
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{"id": 1, "email": "t@example.com", "password_hash": "x", "role": "teacher"}])
+        conn.execute(insert(Class), [{"id": 1, "teacher_id": 1, "class_name": "Bench", "join_code": "BENCH1"}])
+    return engine
+
+
+def add_member(db):
+    member = ClassMember(class_id=1, student_id=1)
+    db.add(member)
+    db.flush()
+    return member.id
+
+
+def run(write, threads: int, seconds: float) -> dict:
+    stats = {"writes": 0, "errors": 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def worker():
+        writes = errors = 0
+        while time.perf_counter() < deadline:
+            try:
+                write()
+                writes += 1
+            except OperationalError:
+                errors += 1
+        with lock:
+            stats["writes"] += writes
+            stats["errors"] += errors
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return {k: v / seconds for k, v in stats.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for threads in args.threads:
+            path = os.path.join(tmp, f"direct-{threads}.db")
+            engine = seed(path)
+            factory = sessionmaker(bind=engine, autoflush=False)
+
+            def direct():
+                with factory() as db:
+                    add_member(db)
+                    db.commit()
+
+            direct_result = run(direct, threads, args.seconds)
+            engine.dispose()
+
+            path = os.path.join(tmp, f"queued-{threads}.db")
+            seed(path).dispose()
+            wq = WriteQueue(path, max_batch=args.max_batch, max_wait=args.max_wait_ms / 1000)
+            queued_result = run(lambda: wq.run(add_member, timeout=30), threads, args.seconds)
+            wq.stop()
+
+            print(
+                f"threads={threads:>3}  direct: {direct_result['writes']:8.1f} w/s "
+                f"({direct_result['errors']:.1f} err/s)  "
+                f"queued: {queued_result['writes']:8.1f} w/s "
+                f"(avg batch {wq.metrics()['avg_batch_size']:.1f})"
+            )
+
+
+if __name__ == "__main__":
+    main()
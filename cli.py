@@ -0,0 +1,253 @@
+import argparse
+import sys
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from config import settings
+from database import SessionLocal, engine, Base
+from migrations import upgrade
+from models import User
+
+
+# ---------------- TARGET DATABASES ---------------- #
+
+def _databases(schools: List[str]) -> Iterator[Tuple[Optional[str], Callable[[], Session]]]:
+    """
+    (school, session factory) for each database a command acts on: app.db
+    when no school is given, else each school's shard, bound with use_shard
+    so caches and leaderboards resolve to that school.
+    """
+    if not schools:
+        yield None, SessionLocal
+        return
+
+    from utils.sharding import list_schools, shards, use_shard
+
+    # fail before touching any database
+    unknown = sorted(set(schools) - set(list_schools()))
+    if unknown:
+        print(f"No such school: {', '.join(unknown)}", file=sys.stderr)
+        raise SystemExit(1)
+
+    try:
+        for school in schools:
+            with use_shard(school) as shard:
+                yield school, shard.SessionLocal
+    finally:
+        shards.close_all()
+
+
+def _schools(args) -> List[str]:
+    if args.all_schools:
+        from utils.sharding import list_schools
+
+        return list_schools()
+    return args.school or []
+
+
+def _label(school: Optional[str]) -> str:
+    return f"{school}: " if school else ""
+
+
+# ---------------- IMPORT QUIZZES ---------------- #
+
+def cmd_import_quizzes(args) -> int:
+    from utils.quiz_import import import_quizzes
+
+    status = 0
+    for school, session_factory in _databases([args.school] if args.school else []):
+        db = session_factory()
+        try:
+            teacher = (
+                db.query(User)
+                .filter(User.email == args.teacher_email, User.role == "teacher")
+                .first()
+            )
+            if teacher is None:
+                print(f"{_label(school)}No teacher with email {args.teacher_email}", file=sys.stderr)
+                status = 1
+                continue
+
+            def progress(report):
+                print(
+                    f"batch {report['batches']}: processed={report['processed']} "
+                    f"imported={report['imported']} failed={report['failed']}",
+                    file=sys.stderr,
+                )
+
+            with open(args.path, encoding="utf-8-sig") as fh:
+                report = import_quizzes(
+                    db, fh, teacher.id, batch_size=args.batch_size, on_progress=progress
+                )
+        finally:
+            db.close()
+
+        for err in report["errors"]:
+            print(f"#{err['index']} {err['title'] or ''}: {err['detail']}", file=sys.stderr)
+        print(
+            f"{_label(school)}processed={report['processed']} imported={report['imported']} "
+            f"failed={report['failed']} batches={report['batches']}"
+        )
+        if report["failed"]:
+            status = 1
+    return status
+
+
+# ---------------- COUNTERS ---------------- #
+
+def cmd_check_counters(args) -> int:
+    from utils.counters import check_counters
+
+    status = 0
+    for school, session_factory in _databases(_schools(args)):
+        db = session_factory()
+        try:
+            mismatches = check_counters(db, repair=args.repair)
+        finally:
+            db.close()
+
+        for m in mismatches:
+            print(f"{_label(school)}{m['counter']} id={m['id']}: "
+                  f"stored={m['stored']} actual={m['actual']}")
+        verb = "repaired" if args.repair else "found"
+        print(f"{_label(school)}{len(mismatches)} mismatched counters {verb}")
+        if mismatches and not args.repair:
+            status = 1
+    return status
+
+
+# ---------------- ARCHIVE ---------------- #
+
+def cmd_archive(args) -> int:
+    from utils.archive import archive_closed
+
+    for school, session_factory in _databases(_schools(args)):
+        db = session_factory()
+        try:
+            report = archive_closed(db, args.days, dry_run=args.dry_run)
+        finally:
+            db.close()
+
+        prefix = "would archive" if args.dry_run else "archived"
+        print(
+            f"{_label(school)}{prefix} quizzes={report['quizzes']} polls={report['polls']} "
+            f"(student results={report['students']}, option tallies={report['options']}); "
+            f"{'would expire' if args.dry_run else 'expired'} "
+            f"idempotency keys={report['idempotency_keys']}"
+        )
+    return 0
+
+
+# ---------------- SHARDS ---------------- #
+
+def cmd_shard_split(args) -> int:
+    import csv
+
+    from utils.sharding import split_database
+
+    with open(args.map, newline="", encoding="utf-8-sig") as fh:
+        assignments = {row[0]: row[1].strip().lower() for row in csv.reader(fh) if len(row) >= 2}
+    assignments.pop("teacher_email", None)  # optional header row
+
+    try:
+        report = split_database(
+            args.source, assignments, default_school=args.default_school, overwrite=args.overwrite
+        )
+    except FileExistsError as exc:
+        print(f"{exc} already exists; pass --overwrite to replace it", file=sys.stderr)
+        return 1
+
+    for school, copied in report["schools"].items():
+        rows = " ".join(f"{table}={n}" for table, n in copied.items() if n)
+        print(f"{school}: {rows or 'empty'}")
+    for email in report["unassigned_teachers"]:
+        print(f"unassigned teacher {email}", file=sys.stderr)
+    return 1 if report["unassigned_teachers"] else 0
+
+
+def cmd_shard_create(args) -> int:
+    from utils.sharding import UnknownSchool, shards
+
+    try:
+        shard = shards.get(args.school, create=True)
+    except UnknownSchool:
+        print(f"Invalid school name {args.school!r}", file=sys.stderr)
+        return 1
+    print(f"{args.school}: {shard.path}")
+    shards.close_all()
+    return 0
+
+
+def cmd_shard_query(args) -> int:
+    from sqlalchemy import text
+
+    from utils.sharding import query_all_shards, shards
+
+    try:
+        results = query_all_shards(
+            lambda db: db.execute(text(args.sql)).all(), schools=args.school or None
+        )
+    finally:
+        shards.close_all()
+
+    for school, rows in results.items():
+        for row in rows:
+            print("\t".join([school, *map(str, row)]))
+    return 0
+
+
+# ---------------- ENTRY POINT ---------------- #
+
+def _add_school_options(p):
+    schools = p.add_mutually_exclusive_group()
+    schools.add_argument("--school", action="append", help="Run on this school's database (repeatable)")
+    schools.add_argument("--all-schools", action="store_true", help="Run on every school's database")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="cli.py", description="Class Pulse admin commands")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("import-quizzes", help="Stream-import quizzes from a JSON/NDJSON file")
+    p.add_argument("path")
+    p.add_argument("--teacher-email", required=True)
+    p.add_argument("--batch-size", type=int, default=100)
+    p.add_argument("--school", help="Import into this school's database instead of app.db")
+    p.set_defaults(func=cmd_import_quizzes)
+
+    p = sub.add_parser("check-counters", help="Verify denormalized counter columns")
+    p.add_argument("--repair", action="store_true", help="Rewrite counters that don't match")
+    _add_school_options(p)
+    p.set_defaults(func=cmd_check_counters)
+
+    p = sub.add_parser("archive", help="Archive responses of long-closed quizzes and polls")
+    p.add_argument("--days", type=int, default=30, help="Closed for more than this many days")
+    p.add_argument("--dry-run", action="store_true")
+    _add_school_options(p)
+    p.set_defaults(func=cmd_archive)
+
+    p = sub.add_parser("shard-split", help="Copy app.db into one database per school")
+    p.add_argument("--map", required=True, help="CSV of teacher_email,school")
+    p.add_argument("--source", default=settings.database_path)
+    p.add_argument("--default-school", help="School for teachers missing from the map")
+    p.add_argument("--overwrite", action="store_true", help="Replace existing shard files")
+    p.set_defaults(func=cmd_shard_split)
+
+    p = sub.add_parser("shard-create", help="Create an empty database for a new school")
+    p.add_argument("school")
+    p.set_defaults(func=cmd_shard_create)
+
+    p = sub.add_parser("shard-query", help="Run a read-only SQL query on every school's database")
+    p.add_argument("sql")
+    p.add_argument("--school", action="append", help="Limit to this school (repeatable)")
+    p.set_defaults(func=cmd_shard_query)
+
+    args = parser.parse_args(argv)
+    Base.metadata.create_all(bind=engine)
+    upgrade(engine)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
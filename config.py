@@ -0,0 +1,116 @@
+from pydantic import BaseModel
+from pydantic_settings import BaseSettings, SettingsConfigDict
+from typing import Optional, Dict
+
+
+# -------------------- Admission Control --------------------
+
+class RouteLimit(BaseModel):
+    # concurrency: requests running at once, and how many may wait for a slot
+    max_concurrency: int = 32
+    max_queue: int = 64
+    queue_timeout: float = 2.0
+
+    # token buckets (requests per second + burst); None disables the bucket.
+    # The user bucket is keyed by the bearer token's user; unauthenticated
+    # routes take it in the handler with check_user_rate (login: the email).
+    user_rate: Optional[float] = None
+    user_burst: int = 5
+    class_rate: Optional[float] = None
+    class_burst: int = 50
+
+
+DEFAULT_ROUTE_LIMITS: Dict[str, RouteLimit] = {
+    "submit_quiz": RouteLimit(
+        max_concurrency=16,
+        max_queue=64,
+        queue_timeout=2.0,
+        user_rate=0.5,
+        user_burst=3,
+        class_rate=50.0,
+        class_burst=200,
+    ),
+    "login": RouteLimit(
+        max_concurrency=8,
+        max_queue=32,
+        queue_timeout=2.0,
+        user_rate=1.0,
+        user_burst=5,
+    ),
+}
+
+
+# -------------------- Settings --------------------
+
+class Settings(BaseSettings):
+    """Runtime settings, overridable with CLASSPULSE_* environment variables."""
+
+    model_config = SettingsConfigDict(env_prefix="CLASSPULSE_")
+
+    database_path: str = "./app.db"
+    sqlite_busy_timeout_ms: int = 5000
+    read_pool_size: int = 8
+    read_pool_overflow: int = 16
+
+    # optional single-writer pipeline with group commit
+    write_queue_enabled: bool = False
+    write_queue_max_batch: int = 64
+    write_queue_max_wait_ms: float = 0.0
+    write_queue_timeout: float = 30.0
+
+    # shared secret for operator endpoints (X-Admin-Token); None disables them
+    admin_token: Optional[str] = None
+
+    admission_enabled: bool = True
+    admission_routes: Dict[str, RouteLimit] = DEFAULT_ROUTE_LIMITS
+    admission_max_keys: int = 50_000
+
+    # bulk roster import: rows per insert batch, hashing processes (None = CPU count)
+    roster_batch_size: int = 500
+    hash_workers: Optional[int] = None
+
+    # response negotiation: bodies smaller than this are sent uncompressed
+    compression_min_size: int = 1024
+    gzip_level: int = 6
+    brotli_quality: int = 5
+    compression_cache_entries: int = 256
+
+    # teacher dashboard
+    dashboard_recent_limit: int = 10
+    dashboard_cache_ttl: float = 60.0
+
+    # how long submit results stay in memory for Idempotency-Key replays
+    idempotency_cache_ttl: float = 600.0
+    # stored Idempotency-Key rows older than this are deleted by the archive job
+    idempotency_key_retention_days: int = 7
+
+    # pre-serialized papers of live quizzes served to students
+    quiz_paper_cache_entries: int = 512
+    quiz_paper_cache_ttl: float = 3600.0
+
+    # class gradebooks, dropped on the next submission in the class
+    gradebook_cache_entries: int = 4096
+    gradebook_cache_ttl: float = 300.0
+
+    # class ownership and membership facts used for authorization
+    authz_cache_entries: int = 50_000
+    authz_cache_ttl: float = 300.0
+
+    # tenant sharding: one SQLite file per school under shard_dir, picked by
+    # the token's "school" claim (or X-School before login)
+    sharding_enabled: bool = False
+    shard_dir: str = "./shards"
+    shard_max_open: int = 32
+
+    # per-request profiling: requests with X-Profile + X-Admin-Token, plus a
+    # random fraction of all requests; only the newest `profile_keep` are kept
+    profile_sample_rate: float = 0.0
+    profile_dir: str = "./profiles"
+    profile_keep: int = 50
+
+    # statements slower than this are logged as JSON and aggregated per query
+    slow_query_ms: float = 200.0
+    slow_query_max_entries: int = 500
+
+
+settings = Settings()
@@ -1,12 +1,99 @@
-from sqlalchemy import create_engine
+from contextvars import ContextVar
+from typing import Optional
+
+from fastapi import HTTPException
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 
-engine = create_engine("sqlite:///./app.db", connect_args={"check_same_thread": False})
+from config import settings
+from utils.profiling import record_sql_timings
+from utils.slow_queries import log_slow_queries
+
+
+def create_write_engine(path: str, wal: bool = True, explicit_begin: bool = False) -> Engine:
+    write_engine = create_engine(
+        f"sqlite:///{path}",
+        connect_args={"check_same_thread": False},
+    )
+
+    @event.listens_for(write_engine, "connect")
+    def _set_pragmas(dbapi_conn, _record):
+        if explicit_begin:
+            # take over transaction control from pysqlite so SAVEPOINTs work
+            dbapi_conn.isolation_level = None
+        cursor = dbapi_conn.cursor()
+        if wal:
+            # WAL lets readers run alongside the single writer
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={settings.sqlite_busy_timeout_ms}")
+        cursor.close()
+
+    if explicit_begin:
+        @event.listens_for(write_engine, "begin")
+        def _begin(conn):
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+    log_slow_queries(write_engine)
+    record_sql_timings(write_engine)
+    return write_engine
+
+
+def create_read_engine(path: str) -> Engine:
+    read_only = create_engine(
+        f"sqlite:///file:{path}?mode=ro&uri=true",
+        connect_args={"check_same_thread": False},
+        pool_size=settings.read_pool_size,
+        max_overflow=settings.read_pool_overflow,
+    )
+
+    @event.listens_for(read_only, "connect")
+    def _set_pragmas(dbapi_conn, _record):
+        cursor = dbapi_conn.cursor()
+        cursor.execute("PRAGMA query_only=ON")
+        cursor.execute(f"PRAGMA busy_timeout={settings.sqlite_busy_timeout_ms}")
+        cursor.close()
+
+    log_slow_queries(read_only)
+    record_sql_timings(read_only)
+    return read_only
+
+
+engine = create_write_engine(settings.database_path)
+read_engine = create_read_engine(settings.database_path)
+
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+ReadSessionLocal = sessionmaker(bind=read_engine, autoflush=False, autocommit=False)
 Base = declarative_base()
 
+# The tenant shard (utils.sharding.Shard) serving the current request, or
+# None for the single app database.
+current_shard: ContextVar = ContextVar("current_shard", default=None)
+
+
+def current_school() -> Optional[str]:
+    shard = current_shard.get()
+    return shard.school if shard is not None else None
+
+
+def _shard_or_default():
+    shard = current_shard.get()
+    if shard is None and settings.sharding_enabled:
+        raise HTTPException(status_code=400, detail="School required")
+    return shard
+
 def get_db():
-    db = SessionLocal()
+    shard = _shard_or_default()
+    db = (shard.SessionLocal if shard is not None else SessionLocal)()
+    try:
+        yield db
+    finally:
+        db.close()
+
+def get_read_db():
+    shard = _shard_or_default()
+    db = (shard.ReadSessionLocal if shard is not None else ReadSessionLocal)()
     try:
         yield db
     finally:
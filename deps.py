@@ -1,8 +1,11 @@
-from fastapi import Depends, HTTPException, status
+import hmac
+
+from fastapi import Depends, Header, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 
-from database import get_db
+from config import settings
+from database import get_read_db
 from models import User
 from utils.jwt_utils import decode_access_token
 
@@ -11,7 +14,7 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
 def get_current_user(
     token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ) -> User:
     try:
         payload = decode_access_token(token)
@@ -65,3 +68,14 @@ def require_student(
             detail="Student role required",
         )
     return current_user
+
+
+def require_admin(x_admin_token: str | None = Header(default=None)) -> None:
+    # Operator endpoints are off unless an admin token is configured
+    if not settings.admin_token or not x_admin_token or not hmac.compare_digest(
+        x_admin_token, settings.admin_token
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin token required",
+        )
@@ -1,12 +1,44 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from database import engine, Base
-from routers import auth, teacher, student
+from database import engine, Base, ReadSessionLocal
+from migrations import upgrade
+from routers import auth, teacher, student, ops
+from utils.admission import AdmissionControlMiddleware
+from utils.leaderboard import leaderboards
+from utils.negotiation import NegotiationMiddleware
+from utils.profiling import ProfilingMiddleware
+from utils.sharding import ShardRoutingMiddleware, shards
+from utils.slow_queries import SlowQueryContextMiddleware
+from utils.write_queue import write_queue
 
 Base.metadata.create_all(bind=engine)
+upgrade(engine)
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    with ReadSessionLocal() as db:
+        leaderboards.load(db)
+    yield
+    # drain queued writes before the process exits
+    write_queue.stop()
+    shards.close_all()
+
 
-app = FastAPI(title="Classroom Polling & Quiz API")
+app = FastAPI(title="Classroom Polling & Quiz API", lifespan=lifespan)
 
+# Middlewares added first run innermost.
+# binds the school's shard around the handler and its dependencies
+app.add_middleware(ShardRoutingMiddleware)
+# exposes the route and role to slow-query log entries
+app.add_middleware(SlowQueryContextMiddleware)
+# inside admission, so profiles time the handler rather than admission queueing
+app.add_middleware(ProfilingMiddleware)
+# added before CORS so CORS wraps them and shed responses still carry CORS headers
+app.add_middleware(AdmissionControlMiddleware)
+app.add_middleware(NegotiationMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -18,6 +50,7 @@ app.add_middleware(
 app.include_router(auth.router, prefix="/auth", tags=["auth"])
 app.include_router(teacher.router, prefix="/teacher", tags=["teacher"])
 app.include_router(student.router, prefix="/student", tags=["student"])
+app.include_router(ops.router, prefix="/ops", tags=["ops"])
 
 @app.get("/")
 def root():
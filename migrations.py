@@ -0,0 +1,90 @@
+"""
+Idempotent schema upgrades for databases created by an older version of
+models.py. `Base.metadata.create_all` only creates missing tables, so new
+columns and indexes on existing tables are applied here, and tables that
+gained AUTOINCREMENT are rebuilt.
+"""
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.schema import CreateTable
+from sqlalchemy.orm import Session
+
+from database import Base
+
+
+def _add_missing_columns(engine: Engine) -> list:
+    added = []
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                if not column.nullable and column.server_default is None:
+                    raise RuntimeError(
+                        f"Cannot add NOT NULL column {table.name}.{column.name} without a server default"
+                    )
+                ddl = column.type.compile(dialect=engine.dialect)
+                default = (
+                    f" DEFAULT {column.server_default.arg}" if column.server_default is not None else ""
+                )
+                null = "" if column.nullable else " NOT NULL"
+                conn.execute(text(
+                    f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {ddl}{default}{null}'
+                ))
+                added.append(f"{table.name}.{column.name}")
+    return added
+
+
+def _enable_autoincrement(engine: Engine) -> list:
+    # SQLite cannot add AUTOINCREMENT in place: copy into a new table and swap
+    # it in. Explicit ids are kept and seed sqlite_sequence with the max id.
+    rebuilt = []
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not table.dialect_options["sqlite"]["autoincrement"]:
+                continue
+            sql = conn.execute(
+                text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                {"name": table.name},
+            ).scalar()
+            if sql is None or "AUTOINCREMENT" in sql.upper():
+                continue
+
+            staging = f"{table.name}__autoincrement"
+            ddl = str(CreateTable(table).compile(dialect=engine.dialect)).strip()
+            conn.execute(text(ddl.replace(f"CREATE TABLE {table.name} ", f'CREATE TABLE "{staging}" ', 1)))
+            columns = ", ".join(f'"{c.name}"' for c in table.columns)
+            conn.execute(text(
+                f'INSERT INTO "{staging}" ({columns}) SELECT {columns} FROM "{table.name}"'
+            ))
+            conn.execute(text(f'DROP TABLE "{table.name}"'))
+            conn.execute(text(f'ALTER TABLE "{staging}" RENAME TO "{table.name}"'))
+            for index in table.indexes:
+                index.create(bind=conn)
+            rebuilt.append(table.name)
+    return rebuilt
+
+
+def _create_missing_indexes(engine: Engine):
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+
+def upgrade(engine: Engine) -> list:
+    """Bring an existing database up to the current models. Returns the columns added."""
+    from utils.counters import check_counters
+
+    added = _add_missing_columns(engine)
+    _enable_autoincrement(engine)
+    _create_missing_indexes(engine)
+
+    # newly added counter columns start at 0 and need a backfill
+    if added:
+        with Session(engine) as db:
+            check_counters(db, repair=True)
+    return added
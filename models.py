@@ -3,7 +3,9 @@ from sqlalchemy import (
     Integer,
     DateTime,
     ForeignKey,
+    Index,
     Text,
+    UniqueConstraint,
 )
 from sqlalchemy.orm import (
     relationship,
@@ -48,11 +50,14 @@ class User(Base):
 
 class Class(Base):
     __tablename__ = "classes"
+    # never reuse the id of a deleted class: authorization facts are cached by id
+    __table_args__ = {"sqlite_autoincrement": True}
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
-    teacher_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
+    teacher_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False, index=True)
     class_name: Mapped[str] = mapped_column(String, nullable=False)
     join_code: Mapped[str] = mapped_column(String, unique=True, index=True)
+    member_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
     created_at: Mapped[DateTime] = mapped_column(
         DateTime(timezone=True),
         server_default=func.now()
@@ -79,8 +84,8 @@ class ClassMember(Base):
     __tablename__ = "class_members"
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
-    class_id: Mapped[int] = mapped_column(ForeignKey("classes.id"))
-    student_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
+    class_id: Mapped[int] = mapped_column(ForeignKey("classes.id"), index=True)
+    student_id: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True)
     joined_at: Mapped[DateTime] = mapped_column(
         DateTime(timezone=True),
         server_default=func.now()
@@ -95,13 +100,16 @@ class Poll(Base):
     __tablename__ = "polls"
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
-    class_id: Mapped[int] = mapped_column(ForeignKey("classes.id"))
+    class_id: Mapped[int] = mapped_column(ForeignKey("classes.id"), index=True)
     question: Mapped[str] = mapped_column(Text, nullable=False)
     status: Mapped[str] = mapped_column(String, default="draft")
+    option_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
     created_at: Mapped[DateTime] = mapped_column(
         DateTime(timezone=True),
         server_default=func.now()
     )
+    closed_at: Mapped[Optional[DateTime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    archived_at: Mapped[Optional[DateTime]] = mapped_column(DateTime(timezone=True), nullable=True)
 
     class_: Mapped["Class"] = relationship(back_populates="polls")
     options: Mapped[List["PollOption"]] = relationship(
@@ -118,7 +126,7 @@ class PollOption(Base):
     __tablename__ = "poll_options"
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
-    poll_id: Mapped[int] = mapped_column(ForeignKey("polls.id"))
+    poll_id: Mapped[int] = mapped_column(ForeignKey("polls.id"), index=True)
     option_text: Mapped[str] = mapped_column(String, nullable=False)
 
     poll: Mapped["Poll"] = relationship(back_populates="options")
@@ -126,6 +134,9 @@ class PollOption(Base):
 
 class PollResponse(Base):
     __tablename__ = "poll_responses"
+    __table_args__ = (
+        Index("ix_poll_responses_poll_option", "poll_id", "option_id"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
     poll_id: Mapped[int] = mapped_column(ForeignKey("polls.id"))
@@ -145,14 +156,18 @@ class Quiz(Base):
     __tablename__ = "quizzes"
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
-    class_id: Mapped[int] = mapped_column(ForeignKey("classes.id"))
+    class_id: Mapped[int] = mapped_column(ForeignKey("classes.id"), index=True)
     title: Mapped[str] = mapped_column(String, nullable=False)
     timer: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
     status: Mapped[str] = mapped_column(String, default="draft")
+    question_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    submission_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
     created_at: Mapped[DateTime] = mapped_column(
         DateTime(timezone=True),
         server_default=func.now()
     )
+    closed_at: Mapped[Optional[DateTime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    archived_at: Mapped[Optional[DateTime]] = mapped_column(DateTime(timezone=True), nullable=True)
 
     class_: Mapped["Class"] = relationship(back_populates="quizzes")
     questions: Mapped[List["QuizQuestion"]] = relationship(
@@ -165,7 +180,7 @@ class QuizQuestion(Base):
     __tablename__ = "quiz_questions"
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
-    quiz_id: Mapped[int] = mapped_column(ForeignKey("quizzes.id"))
+    quiz_id: Mapped[int] = mapped_column(ForeignKey("quizzes.id"), index=True)
     question_text: Mapped[str] = mapped_column(Text, nullable=False)
     correct_option_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
 
@@ -180,7 +195,7 @@ class QuizOption(Base):
     __tablename__ = "quiz_options"
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
-    question_id: Mapped[int] = mapped_column(ForeignKey("quiz_questions.id"))
+    question_id: Mapped[int] = mapped_column(ForeignKey("quiz_questions.id"), index=True)
     option_text: Mapped[str] = mapped_column(String, nullable=False)
 
     question: Mapped["QuizQuestion"] = relationship(back_populates="options")
@@ -188,6 +203,9 @@ class QuizOption(Base):
 
 class QuizResponse(Base):
     __tablename__ = "quiz_responses"
+    __table_args__ = (
+        Index("ix_quiz_responses_quiz_student_question", "quiz_id", "student_id", "question_id"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
     quiz_id: Mapped[int] = mapped_column(ForeignKey("quizzes.id"))
@@ -198,3 +216,51 @@ class QuizResponse(Base):
         DateTime(timezone=True),
         server_default=func.now()
     )
+
+
+# ---------------- ARCHIVE ---------------- #
+
+class QuizResultArchive(Base):
+    """Final score per student for an archived quiz; its quiz_responses are deleted."""
+    __tablename__ = "quiz_results_archive"
+    __table_args__ = (
+        UniqueConstraint("quiz_id", "student_id", name="uq_quiz_results_archive_quiz_student"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    quiz_id: Mapped[int] = mapped_column(ForeignKey("quizzes.id"), nullable=False)
+    student_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False, index=True)
+    score: Mapped[int] = mapped_column(Integer, nullable=False)
+    total: Mapped[int] = mapped_column(Integer, nullable=False)
+    # one "1"/"0" per question, in question id order
+    correct_mask: Mapped[str] = mapped_column(String, nullable=False)
+
+
+class PollTallyArchive(Base):
+    """Final vote count per option for an archived poll; its poll_responses are deleted."""
+    __tablename__ = "poll_tallies_archive"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    poll_id: Mapped[int] = mapped_column(ForeignKey("polls.id"), nullable=False, index=True)
+    option_id: Mapped[int] = mapped_column(ForeignKey("poll_options.id"), nullable=False)
+    votes: Mapped[int] = mapped_column(Integer, nullable=False)
+
+
+# ---------------- IDEMPOTENCY ---------------- #
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (
+        UniqueConstraint("student_id", "key", name="uq_idempotency_keys_student_key"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True, index=True)
+    key: Mapped[str] = mapped_column(String(255), nullable=False)
+    student_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
+    quiz_id: Mapped[int] = mapped_column(ForeignKey("quizzes.id"), nullable=False, index=True)
+    response: Mapped[str] = mapped_column(Text, nullable=False)
+    created_at: Mapped[DateTime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        index=True,
+    )
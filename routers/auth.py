@@ -1,19 +1,23 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import func
 from sqlalchemy.orm import Session
-from database import get_db
+from database import current_school, get_db
 from models import User
 from schemas import UserCreate, Token, UserOut, LoginSchema
+from utils.admission import check_user_rate
 from utils.hashing import hash_password, verify_password
 from utils.jwt_utils import create_access_token
+from utils.profiling import ProfiledRoute
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
 
 
 # ---------------- SIGNUP ---------------- #
 
 @router.post('/signup', response_model=UserOut)
 def signup(user_in: UserCreate, db: Session = Depends(get_db)):
-    existing = db.query(User).filter(User.email == user_in.email).first()
+    # case-insensitive, like roster imports, so no case-variant duplicates
+    existing = db.query(User).filter(func.lower(User.email) == user_in.email.lower()).first()
     if existing:
         raise HTTPException(status_code=400, detail='Email already registered')
 
@@ -37,6 +41,9 @@ def signup(user_in: UserCreate, db: Session = Depends(get_db)):
 def login(payload: LoginSchema, db: Session = Depends(get_db)):
     # accept JSON: { "email": "...", "password": "..." }
 
+    # per account rather than per address: a classroom shares one NAT
+    check_user_rate("login", payload.email.lower())
+
     user = db.query(User).filter(User.email == payload.email).first()
 
     if not user:
@@ -46,9 +53,14 @@ def login(payload: LoginSchema, db: Session = Depends(get_db)):
         raise HTTPException(status_code=401, detail='Incorrect credentials')
 
     # generate JWT
-    token = create_access_token({
+    claims = {
         "user_id": user.id,
         "role": user.role
-    })
+    }
+    school = current_school()
+    if school is not None:
+        # later requests are routed to this school's shard by the claim
+        claims["school"] = school
+    token = create_access_token(claims)
 
     return {"access_token": token, "token_type": "bearer"}
@@ -0,0 +1,66 @@
+from fastapi import APIRouter, Depends, Query
+
+from config import settings
+from deps import require_admin
+from utils.admission import admission_metrics
+from utils.profiling import ProfiledRoute
+from utils.sharding import list_schools, shards
+from utils.slow_queries import slow_query_log
+from utils.write_queue import write_queue
+
+router = APIRouter(dependencies=[Depends(require_admin)], route_class=ProfiledRoute)
+
+
+# --------------------------------------------------
+#                  ADMISSION CONTROL
+# --------------------------------------------------
+
+@router.get("/metrics/admission")
+def get_admission_metrics():
+    return {"status": "success", "data": admission_metrics()}
+
+
+# --------------------------------------------------
+#                    WRITE QUEUE
+# --------------------------------------------------
+
+@router.get("/metrics/write-queue")
+def get_write_queue_metrics():
+    return {"status": "success", "data": write_queue.metrics()}
+
+
+# --------------------------------------------------
+#                   SLOW QUERIES
+# --------------------------------------------------
+
+@router.get("/slow-queries")
+def get_slow_queries(limit: int = Query(20, ge=1, le=200)):
+    return {
+        "status": "success",
+        "data": {
+            "threshold_ms": settings.slow_query_ms,
+            "queries": slow_query_log.top(limit),
+        },
+    }
+
+
+@router.delete("/slow-queries")
+def reset_slow_queries():
+    slow_query_log.clear()
+    return {"status": "success", "message": "Slow query log cleared"}
+
+
+# --------------------------------------------------
+#                      SHARDS
+# --------------------------------------------------
+
+@router.get("/shards")
+def get_shards():
+    return {
+        "status": "success",
+        "data": {
+            "enabled": settings.sharding_enabled,
+            "schools": list_schools(),
+            **shards.metrics(),
+        },
+    }
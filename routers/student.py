@@ -1,20 +1,40 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from typing import Optional
+import json
 
-from database import get_db
+from database import get_db, get_read_db
 from deps import require_student
-from models import Quiz, QuizQuestion, QuizResponse, ClassMember, Class, User
+from models import Quiz, QuizQuestion, QuizResponse, ClassMember, Class, User, IdempotencyKey
 from schemas import QuizSubmitPayload, JoinClass
-
-router = APIRouter(prefix="/student", tags=["Student"])
+from utils.admission import check_class_rate
+from utils.archive import archived_quiz_results
+from utils.authz import is_member, require_member
+from utils.cache import (
+    class_version,
+    gradebook_cache,
+    idempotency_cache,
+    invalidate_class,
+    invalidate_membership,
+    invalidate_teacher,
+    quiz_paper_cache,
+)
+from utils.counters import bump
+from utils.gradebook import student_gradebook
+from utils.leaderboard import leaderboards
+from utils.profiling import ProfiledRoute
+from utils.quiz_papers import build_paper
+from utils.write_queue import run_write
+
+router = APIRouter(prefix="/student", tags=["Student"], route_class=ProfiledRoute)
 
 
 # -----------------------------------------------------------
 #                     Get My Classes
 # -----------------------------------------------------------
 @router.get("/classes")
-def get_my_classes(student: User = Depends(require_student), db: Session = Depends(get_db)):
+def get_my_classes(student: User = Depends(require_student), db: Session = Depends(get_read_db)):
     if not student or not getattr(student, "id", None):
         raise HTTPException(status_code=400, detail="Invalid student credentials")
 
@@ -39,12 +59,14 @@ def get_my_classes(student: User = Depends(require_student), db: Session = Depen
 #                     List My Quizzes
 # -----------------------------------------------------------
 @router.get("/quizzes")
-def get_my_quizzes(student: User = Depends(require_student), db: Session = Depends(get_db)):
+def get_my_quizzes(student: User = Depends(require_student), db: Session = Depends(get_read_db)):
 
-    memberships = db.query(ClassMember).filter(ClassMember.student_id == student.id).all()
-    class_ids = [m.class_id for m in memberships]
+    class_ids = (
+        db.query(ClassMember.class_id)
+        .filter(ClassMember.student_id == student.id)
+        .scalar_subquery()
+    )
 
-    # Include question count
     quizzes = (
         db.query(
             Quiz.id.label("quiz_id"),
@@ -53,11 +75,9 @@ def get_my_quizzes(student: User = Depends(require_student), db: Session = Depen
             Quiz.timer,
             Quiz.status,
             Quiz.created_at,
-            func.count(QuizQuestion.id).label("question_count")
+            Quiz.question_count,
         )
-        .outerjoin(QuizQuestion, QuizQuestion.quiz_id == Quiz.id)
         .filter(Quiz.class_id.in_(class_ids))
-        .group_by(Quiz.id)
         .all()
     )
 
@@ -77,6 +97,33 @@ def get_my_quizzes(student: User = Depends(require_student), db: Session = Depen
     return {"status": "success", "data": quiz_list}
 
 
+# -----------------------------------------------------------
+#                     Quiz Paper
+# -----------------------------------------------------------
+@router.get("/quizzes/{quiz_id}")
+def get_quiz_paper(
+    quiz_id: int,
+    student: User = Depends(require_student),
+    db: Session = Depends(get_read_db),
+    if_none_match: Optional[str] = Header(default=None),
+):
+    # built when the quiz goes live; rebuilt here only after a restart or eviction
+    paper = quiz_paper_cache.get_or_set(quiz_id, lambda: build_paper(db, quiz_id))
+    if paper is None:
+        raise HTTPException(status_code=404, detail="Quiz not available")
+
+    require_member(db, paper.class_id, student)
+
+    if paper.not_modified(if_none_match):
+        return Response(status_code=304, headers={"ETag": paper.etag})
+
+    return Response(
+        content=paper.body,
+        media_type="application/json",
+        headers={"ETag": paper.etag, "Cache-Control": "private, no-cache"},
+    )
+
+
 # -----------------------------------------------------------
 #                       Join Class
 # -----------------------------------------------------------
@@ -90,18 +137,20 @@ def join_class(
     if cls is None:
         raise HTTPException(status_code=404, detail="Class not found")
 
-    membership = db.query(ClassMember).filter(
-        ClassMember.class_id == cls.id,
-        ClassMember.student_id == student.id,
-    ).first()
-
-    if membership:
+    if is_member(db, cls.id, student.id):
         raise HTTPException(status_code=409, detail="Already a member of this class")
 
-    new_member = ClassMember(class_id=cls.id, student_id=student.id)
-    db.add(new_member)
-    db.commit()
-    db.refresh(new_member)
+    def add_member(wdb: Session) -> int:
+        new_member = ClassMember(class_id=cls.id, student_id=student.id)
+        wdb.add(new_member)
+        bump(wdb, Class.member_count, cls.id)
+        wdb.flush()
+        return new_member.id
+
+    run_write(db, add_member)
+    invalidate_teacher(cls.teacher_id)
+    invalidate_class(cls.id)
+    invalidate_membership(cls.id, student.id)
 
     return {
         "status": "success",
@@ -113,42 +162,75 @@ def join_class(
 # -----------------------------------------------------------
 #                    Submit Quiz
 # -----------------------------------------------------------
-@router.post("/quizzes/{quiz_id}/submit")
-def submit_quiz(
-    quiz_id: int,
-    payload: QuizSubmitPayload,
-    student: User = Depends(require_student),
-    db: Session = Depends(get_db),
-):
-    quiz = db.query(Quiz).filter(Quiz.id == quiz_id).first()
-    if quiz is None:
-        raise HTTPException(status_code=404, detail="Quiz not available")
+def _replay_submission(db: Session, student_id: int, key: str, quiz_id: int) -> Optional[dict]:
+    """Return the stored response for a previously used Idempotency-Key, if any."""
+    cached = idempotency_cache.get((student_id, key))
+    if cached is None:
+        record = db.query(IdempotencyKey).filter(
+            IdempotencyKey.student_id == student_id,
+            IdempotencyKey.key == key,
+        ).first()
+        if record is None:
+            return None
+        cached = (record.quiz_id, json.loads(record.response))
+        idempotency_cache.set((student_id, key), cached)
+
+    original_quiz_id, body = cached
+    if original_quiz_id != quiz_id:
+        raise HTTPException(
+            status_code=422,
+            detail="Idempotency-Key was already used for a different quiz",
+        )
+    return body
 
-    membership = db.query(ClassMember).filter(
-        ClassMember.class_id == quiz.class_id,
-        ClassMember.student_id == student.id,
-    ).first()
-    if membership is None:
-        raise HTTPException(status_code=403, detail="Not a member of this class")
 
-    existing = db.query(QuizResponse).filter(
+def _replay_after_conflict(
+    db: Session, student_id: int, key: Optional[str], quiz_id: int, exc: IntegrityError
+) -> dict:
+    db.rollback()
+    replay = _replay_submission(db, student_id, key, quiz_id) if key else None
+    if replay is None:
+        raise exc
+    return replay
+
+
+def _record_submission(
+    db: Session, quiz_id: int, student_id: int, answers: list, idempotency_key: Optional[str]
+) -> dict:
+    """Write unit for submit_quiz: stores the answers and returns the scored response."""
+    # re-checked here because queued writes are applied one at a time
+    existing = db.query(QuizResponse.id).filter(
         QuizResponse.quiz_id == quiz_id,
-        QuizResponse.student_id == student.id
+        QuizResponse.student_id == student_id
     ).first()
     if existing:
         raise HTTPException(status_code=409, detail="Quiz already submitted")
 
+    # Claim the key first: its unique constraint makes a concurrent retry fail
+    record = None
+    if idempotency_key:
+        record = IdempotencyKey(
+            key=idempotency_key,
+            student_id=student_id,
+            quiz_id=quiz_id,
+            response="",
+        )
+        db.add(record)
+
     # Save responses
-    for ans in payload.answers:
+    for ans in answers:
         response = QuizResponse(
             quiz_id=quiz_id,
             question_id=ans.question_id,
-            student_id=student.id,
+            student_id=student_id,
             option_id=ans.option_id
         )
         db.add(response)
 
-    db.commit()
+    if answers:
+        bump(db, Quiz.submission_count, quiz_id)
+
+    db.flush()
 
     # Calculate results
     questions = db.query(QuizQuestion).filter(QuizQuestion.quiz_id == quiz_id).all()
@@ -159,7 +241,7 @@ def submit_quiz(
         response = db.query(QuizResponse).filter(
             QuizResponse.quiz_id == quiz_id,
             QuizResponse.question_id == question.id,
-            QuizResponse.student_id == student.id
+            QuizResponse.student_id == student_id
         ).first()
 
         is_correct = response is not None and response.option_id == question.correct_option_id
@@ -171,7 +253,7 @@ def submit_quiz(
     total = len(questions)
     percentage = (correct / total * 100) if total > 0 else 0
 
-    return {
+    result = {
         "status": "success",
         "data": {
             "score": correct,
@@ -181,6 +263,74 @@ def submit_quiz(
         },
     }
 
+    if record is not None:
+        record.response = json.dumps(result)
+
+    return result
+
+
+@router.post("/quizzes/{quiz_id}/submit")
+def submit_quiz(
+    quiz_id: int,
+    payload: QuizSubmitPayload,
+    student: User = Depends(require_student),
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(default=None, max_length=255),
+):
+    # Retries carrying the same key get the original result without re-scoring
+    if idempotency_key:
+        replay = _replay_submission(db, student.id, idempotency_key, quiz_id)
+        if replay is not None:
+            return replay
+
+    quiz = db.query(Quiz).filter(Quiz.id == quiz_id).first()
+    if quiz is None:
+        raise HTTPException(status_code=404, detail="Quiz not available")
+
+    if quiz.archived_at is not None:
+        raise HTTPException(status_code=409, detail="Quiz is archived")
+
+    require_member(db, quiz.class_id, student)
+
+    # only members may spend the class's bucket
+    check_class_rate("submit_quiz", quiz.class_id)
+
+    existing = db.query(QuizResponse).filter(
+        QuizResponse.quiz_id == quiz_id,
+        QuizResponse.student_id == student.id
+    ).first()
+    if existing:
+        # a concurrent retry may have committed since the lookup above
+        if idempotency_key:
+            replay = _replay_submission(db, student.id, idempotency_key, quiz_id)
+            if replay is not None:
+                return replay
+        raise HTTPException(status_code=409, detail="Quiz already submitted")
+
+    def record(wdb: Session) -> dict:
+        return _record_submission(wdb, quiz_id, student.id, payload.answers, idempotency_key)
+
+    try:
+        result = run_write(db, record)
+    except IntegrityError as exc:
+        return _replay_after_conflict(db, student.id, idempotency_key, quiz_id, exc)
+    except HTTPException as exc:
+        # lost the race to a concurrent retry inside the writer
+        if exc.status_code == 409 and idempotency_key:
+            replay = _replay_submission(db, student.id, idempotency_key, quiz_id)
+            if replay is not None:
+                return replay
+        raise
+
+    if idempotency_key:
+        idempotency_cache.set((student.id, idempotency_key), (quiz_id, result))
+    invalidate_teacher(quiz.class_.teacher_id)
+    invalidate_class(quiz.class_id)
+    if payload.answers:
+        leaderboards.record(quiz.class_id, student.id, result["data"]["score"])
+
+    return result
+
 
 # -----------------------------------------------------------
 #                   Quiz Result (My Result)
@@ -189,18 +339,20 @@ def submit_quiz(
 def my_quiz_result(
     quiz_id: int,
     student: User = Depends(require_student),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     quiz = db.query(Quiz).filter(Quiz.id == quiz_id).first()
     if quiz is None:
         raise HTTPException(status_code=404, detail="Quiz not found")
 
-    membership = db.query(ClassMember).filter(
-        ClassMember.class_id == quiz.class_id,
-        ClassMember.student_id == student.id,
-    ).first()
-    if membership is None:
-        raise HTTPException(status_code=403, detail="Not a member of this class")
+    require_member(db, quiz.class_id, student)
+
+    if quiz.archived_at is not None:
+        archived = archived_quiz_results(db, quiz_id, student_id=student.id)
+        if archived:
+            result = archived[0]
+            del result["student_id"]
+            return {"status": "success", "data": result}
 
     questions = db.query(QuizQuestion).filter(QuizQuestion.quiz_id == quiz_id).all()
     correct = 0
@@ -232,3 +384,38 @@ def my_quiz_result(
             "details": details
         },
     }
+
+
+# -----------------------------------------------------------
+#                      My Gradebook
+# -----------------------------------------------------------
+@router.get("/classes/{class_id}/gradebook")
+def my_gradebook(
+    class_id: int,
+    student: User = Depends(require_student),
+    db: Session = Depends(get_read_db),
+):
+    require_member(db, class_id, student)
+
+    data = gradebook_cache.get_or_set(
+        (class_id, class_version(class_id), student.id),
+        lambda: student_gradebook(db, class_id, student.id),
+    )
+    return {"status": "success", "data": data}
+
+
+# -----------------------------------------------------------
+#                   My Leaderboard Rank
+# -----------------------------------------------------------
+@router.get("/classes/{class_id}/leaderboard/me")
+def my_leaderboard_rank(
+    class_id: int,
+    student: User = Depends(require_student),
+    db: Session = Depends(get_read_db),
+):
+    require_member(db, class_id, student)
+
+    board = leaderboards.current(db, class_id)
+    entry = board.rank(student.id) or {"rank": None, "score": 0, "quizzes": 0}
+
+    return {"status": "success", "data": {**entry, "students_ranked": len(board)}}
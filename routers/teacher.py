@@ -1,13 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Query
+from pydantic import ValidationError
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, insert, select
+import codecs
+import csv
 import string
 import random
 
-from database import get_db
+from config import settings
+
+from database import get_db, get_read_db
 from deps import require_teacher
 from models import (
     Class,
+    ClassMember,
     User,
     Poll,
     PollOption,
@@ -16,10 +22,33 @@ from models import (
     QuizQuestion,
     QuizOption,
     QuizResponse,
+    QuizResultArchive,
+    PollTallyArchive,
+)
+from schemas import CreateClass, PollCreate, QuizCreate, RosterImport, RosterStudentIn
+from utils.archive import archived_poll_tally, archived_quiz_results
+from utils.authz import owns_class, require_class_owner
+from utils.cache import (
+    class_version,
+    dashboard_cache,
+    gradebook_cache,
+    idempotency_cache,
+    invalidate_class,
+    invalidate_class_authz,
+    invalidate_membership,
+    invalidate_teacher,
+    quiz_paper_cache,
 )
-from schemas import CreateClass, PollCreate, QuizCreate
+from utils.counters import bump
+from utils import deletion
+from utils.gradebook import class_gradebook
+from utils.hashing import hash_passwords
+from utils.leaderboard import leaderboards
+from utils.profiling import ProfiledRoute
+from utils.quiz_import import import_quizzes, open_text
+from utils.quiz_papers import build_paper
 
-router = APIRouter(prefix="/teacher", tags=["Teacher"])
+router = APIRouter(prefix="/teacher", tags=["Teacher"], route_class=ProfiledRoute)
 
 
 def generate_join_code(length: int = 6) -> str:
@@ -49,6 +78,8 @@ def create_class(
     db.add(new_class)
     db.commit()
     db.refresh(new_class)
+    invalidate_teacher(teacher.id)
+    invalidate_class_authz(new_class.id)
 
     return {
         "status": "success",
@@ -60,7 +91,7 @@ def create_class(
 @router.get("/classes")
 def list_classes(
     teacher: User = Depends(require_teacher),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     classes = db.query(Class).filter(Class.teacher_id == teacher.id).all()
     return {
@@ -72,6 +103,300 @@ def list_classes(
     }
 
 
+@router.delete("/classes/{class_id}")
+def delete_class(
+    class_id: int,
+    teacher: User = Depends(require_teacher),
+    db: Session = Depends(get_db),
+):
+    require_class_owner(db, class_id, teacher)
+
+    quiz_ids = [qid for (qid,) in db.query(Quiz.id).filter(Quiz.class_id == class_id).all()]
+    report = deletion.delete_class(db, class_id)
+    db.commit()
+
+    invalidate_teacher(teacher.id)
+    invalidate_class(class_id)
+    invalidate_class_authz(class_id)
+    leaderboards.drop(class_id)
+    for quiz_id in quiz_ids:
+        quiz_paper_cache.pop(quiz_id)
+    if quiz_ids:
+        # stored submit results may point at the deleted quizzes
+        idempotency_cache.clear()
+
+    return {"status": "success", "message": "Class deleted", "data": report}
+
+
+# --------------------------------------------------
+#                    DASHBOARD
+# --------------------------------------------------
+
+def _build_dashboard(db: Session, teacher_id: int) -> dict:
+    limit = settings.dashboard_recent_limit
+
+    classes = db.execute(
+        select(Class.id, Class.class_name, Class.join_code, Class.member_count)
+        .where(Class.teacher_id == teacher_id)
+        .order_by(Class.id)
+    ).all()
+
+    # archived polls and quizzes keep only summaries, so add those in
+    vote_count = (
+        select(func.count(PollResponse.id))
+        .where(PollResponse.poll_id == Poll.id)
+        .scalar_subquery()
+    ) + (
+        select(func.coalesce(func.sum(PollTallyArchive.votes), 0))
+        .where(PollTallyArchive.poll_id == Poll.id)
+        .scalar_subquery()
+    )
+    polls = db.execute(
+        select(Poll.id, Poll.class_id, Poll.question, Poll.status, Poll.created_at,
+               vote_count.label("vote_count"))
+        .join(Class, Poll.class_id == Class.id)
+        .where(Class.teacher_id == teacher_id)
+        .order_by(Poll.created_at.desc(), Poll.id.desc())
+        .limit(limit)
+    ).all()
+
+    correct_count = (
+        select(func.count(QuizResponse.id))
+        .join(QuizQuestion, QuizQuestion.id == QuizResponse.question_id)
+        .where(
+            QuizResponse.quiz_id == Quiz.id,
+            QuizQuestion.quiz_id == Quiz.id,
+            QuizResponse.option_id == QuizQuestion.correct_option_id,
+        )
+        .scalar_subquery()
+    ) + (
+        select(func.coalesce(func.sum(QuizResultArchive.score), 0))
+        .where(QuizResultArchive.quiz_id == Quiz.id)
+        .scalar_subquery()
+    )
+    quizzes = db.execute(
+        select(Quiz.id, Quiz.class_id, Quiz.title, Quiz.status, Quiz.timer, Quiz.created_at,
+               Quiz.question_count, Quiz.submission_count,
+               correct_count.label("correct_count"))
+        .join(Class, Quiz.class_id == Class.id)
+        .where(Class.teacher_id == teacher_id)
+        .order_by(Quiz.created_at.desc(), Quiz.id.desc())
+        .limit(limit)
+    ).all()
+
+    def average(q) -> float | None:
+        possible = q.submission_count * q.question_count
+        return (q.correct_count / possible * 100) if possible else None
+
+    return {
+        "classes": [
+            {"id": c.id, "class_name": c.class_name, "join_code": c.join_code,
+             "member_count": c.member_count}
+            for c in classes
+        ],
+        "recent_polls": [
+            {"id": p.id, "class_id": p.class_id, "question": p.question, "status": p.status,
+             "created_at": p.created_at, "vote_count": p.vote_count}
+            for p in polls
+        ],
+        "recent_quizzes": [
+            {"id": q.id, "class_id": q.class_id, "title": q.title, "status": q.status,
+             "timer": q.timer, "created_at": q.created_at,
+             "question_count": q.question_count,
+             "submission_count": q.submission_count,
+             "average_percentage": average(q)}
+            for q in quizzes
+        ],
+    }
+
+
+@router.get("/dashboard")
+def dashboard(
+    teacher: User = Depends(require_teacher),
+    db: Session = Depends(get_read_db),
+):
+    data = dashboard_cache.get_or_set(teacher.id, lambda: _build_dashboard(db, teacher.id))
+    return {"status": "success", "data": data}
+
+
+# --------------------------------------------------
+#               LEADERBOARD & GRADEBOOK
+# --------------------------------------------------
+
+@router.get("/classes/{class_id}/leaderboard")
+def class_leaderboard(
+    class_id: int,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=200),
+    teacher: User = Depends(require_teacher),
+    db: Session = Depends(get_read_db),
+):
+    require_class_owner(db, class_id, teacher)
+
+    board = leaderboards.current(db, class_id)
+    entries = board.page(offset, limit)
+    names = dict(
+        db.query(User.id, User.full_name)
+        .filter(User.id.in_([e["student_id"] for e in entries]))
+        .all()
+    ) if entries else {}
+    for entry in entries:
+        entry["full_name"] = names.get(entry["student_id"])
+
+    return {
+        "status": "success",
+        "data": {"class_id": class_id, "total": len(board), "entries": entries},
+    }
+
+
+@router.get("/classes/{class_id}/gradebook")
+def gradebook(
+    class_id: int,
+    teacher: User = Depends(require_teacher),
+    db: Session = Depends(get_read_db),
+):
+    require_class_owner(db, class_id, teacher)
+
+    data = gradebook_cache.get_or_set(
+        (class_id, class_version(class_id), None),
+        lambda: class_gradebook(db, class_id),
+    )
+    return {"status": "success", "data": data}
+
+
+# --------------------------------------------------
+#                  ROSTER IMPORT
+# --------------------------------------------------
+
+def _import_roster(db: Session, class_id: int, rows: list) -> dict:
+    results = [None] * len(rows)
+    valid = []
+    seen = set()
+
+    # addresses are stored as given, since login matches them exactly;
+    # duplicates are detected case-insensitively
+    for i, raw in enumerate(rows):
+        try:
+            row = RosterStudentIn.model_validate(raw)
+        except ValidationError as exc:
+            email = raw.get("email") if isinstance(raw, dict) else None
+            results[i] = {"row": i, "email": email, "status": "error",
+                          "detail": exc.errors(include_url=False)[0]["msg"]}
+            continue
+
+        key = row.email.lower()
+        if key in seen:
+            results[i] = {"row": i, "email": row.email, "status": "error",
+                          "detail": "Duplicate email in roster"}
+            continue
+        seen.add(key)
+        valid.append((i, key, row))
+
+    batch_size = max(1, settings.roster_batch_size)
+    for start in range(0, len(valid), batch_size):
+        batch = valid[start:start + batch_size]
+        keys = [key for _, key, _ in batch]
+
+        existing = {
+            u.email.lower(): u
+            for u in db.query(User.id, User.email, User.role)
+            .filter(func.lower(User.email).in_(keys))
+            .all()
+        }
+
+        new_rows = [row for _, key, row in batch if key not in existing]
+        hashes = hash_passwords(row.password for row in new_rows)
+
+        user_ids = {key: u.id for key, u in existing.items() if u.role == "student"}
+        if new_rows:
+            inserted = db.execute(
+                insert(User).returning(User.id, User.email),
+                [
+                    {"full_name": row.full_name, "email": row.email,
+                     "password_hash": hashed, "role": "student"}
+                    for row, hashed in zip(new_rows, hashes)
+                ],
+            ).all()
+            user_ids.update({email.lower(): uid for uid, email in inserted})
+
+        already = {
+            m.student_id
+            for m in db.query(ClassMember.student_id)
+            .filter(
+                ClassMember.class_id == class_id,
+                ClassMember.student_id.in_(list(user_ids.values())),
+            )
+            .all()
+        }
+
+        members = []
+        for i, key, row in batch:
+            if key in existing and existing[key].role != "student":
+                results[i] = {"row": i, "email": row.email, "status": "error",
+                              "detail": "Email registered to a non-student account"}
+                continue
+
+            uid = user_ids[key]
+            if uid in already:
+                results[i] = {"row": i, "email": row.email, "status": "already_member",
+                              "student_id": uid}
+                continue
+
+            members.append({"class_id": class_id, "student_id": uid})
+            results[i] = {"row": i, "email": row.email,
+                          "status": "enrolled" if key in existing else "created",
+                          "student_id": uid}
+
+        if members:
+            db.execute(insert(ClassMember), members)
+            bump(db, Class.member_count, class_id, len(members))
+        db.commit()
+
+    counts = {"created": 0, "enrolled": 0, "already_member": 0, "error": 0}
+    for r in results:
+        counts[r["status"]] += 1
+
+    return {"status": "success", "data": {**counts, "results": results}}
+
+
+@router.post("/classes/{class_id}/roster")
+def import_roster(
+    class_id: int,
+    payload: RosterImport,
+    teacher: User = Depends(require_teacher),
+    db: Session = Depends(get_db),
+):
+    require_class_owner(db, class_id, teacher)
+    try:
+        return _import_roster(db, class_id, payload.students)
+    finally:
+        invalidate_teacher(teacher.id)
+        invalidate_class(class_id)
+        invalidate_membership(class_id)
+
+
+@router.post("/classes/{class_id}/roster/csv")
+def import_roster_csv(
+    class_id: int,
+    file: UploadFile = File(...),
+    teacher: User = Depends(require_teacher),
+    db: Session = Depends(get_db),
+):
+    # CSV header: email,password[,full_name]
+    require_class_owner(db, class_id, teacher)
+    reader = csv.DictReader(codecs.iterdecode(file.file, "utf-8-sig"))
+    rows = [{k.strip(): (v or "").strip() for k, v in r.items() if k} for r in reader]
+    for r in rows:
+        if not r.get("full_name"):
+            r.pop("full_name", None)
+    try:
+        return _import_roster(db, class_id, rows)
+    finally:
+        invalidate_teacher(teacher.id)
+        invalidate_class(class_id)
+        invalidate_membership(class_id)
+
+
 # --------------------------------------------------
 #                     POLLS
 # --------------------------------------------------
@@ -82,19 +407,14 @@ def create_poll(
     teacher: User = Depends(require_teacher),
     db: Session = Depends(get_db),
 ):
-    cls = (
-        db.query(Class)
-        .filter(Class.id == payload.class_id, Class.teacher_id == teacher.id)
-        .first()
-    )
-
-    if not cls:
-        raise HTTPException(
-            status_code=404,
-            detail="Class not found or not owned by you",
-        )
+    require_class_owner(db, payload.class_id, teacher)
 
-    poll = Poll(class_id=payload.class_id, question=payload.question, status="draft")
+    poll = Poll(
+        class_id=payload.class_id,
+        question=payload.question,
+        status="draft",
+        option_count=len(payload.options),
+    )
     db.add(poll)
     db.flush()
 
@@ -103,6 +423,7 @@ def create_poll(
 
     db.commit()
     db.refresh(poll)
+    invalidate_teacher(teacher.id)
 
     return {"status": "success", "data": {"poll_id": poll.id}}
 
@@ -110,17 +431,12 @@ def create_poll(
 @router.get("/polls")
 def list_polls(
     teacher: User = Depends(require_teacher),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     polls = (
-        db.query(
-            Poll,
-            func.count(PollOption.id).label("option_count"),
-        )
+        db.query(Poll)
         .join(Class, Poll.class_id == Class.id)
-        .outerjoin(PollOption, PollOption.poll_id == Poll.id)
         .filter(Class.teacher_id == teacher.id)
-        .group_by(Poll.id)
         .all()
     )
 
@@ -128,10 +444,10 @@ def list_polls(
         "status": "success",
         "data": [
             {
-                "id": p.Poll.id,
-                "question": p.Poll.question,
-                "class_id": p.Poll.class_id,
-                "status": p.Poll.status,
+                "id": p.id,
+                "question": p.question,
+                "class_id": p.class_id,
+                "status": p.status,
                 "option_count": p.option_count,
             }
             for p in polls
@@ -146,21 +462,17 @@ def set_poll_status(
     teacher: User = Depends(require_teacher),
     db: Session = Depends(get_db),
 ):
-    poll = (
-        db.query(Poll)
-        .join(Class)
-        .filter(Poll.id == poll_id, Class.teacher_id == teacher.id)
-        .first()
-    )
-
-    if not poll:
+    poll = db.query(Poll).filter(Poll.id == poll_id).first()
+    if not poll or not owns_class(db, poll.class_id, teacher):
         raise HTTPException(404, "Poll not found")
 
     if new_status not in ("draft", "live", "closed"):
         raise HTTPException(400, "Invalid status")
 
     poll.status = new_status
+    poll.closed_at = func.now() if new_status == "closed" else None
     db.commit()
+    invalidate_teacher(teacher.id)
     return {"status": "success", "message": f"Poll status set to {new_status}"}
 
 
@@ -168,24 +480,28 @@ def set_poll_status(
 def poll_results(
     poll_id: int,
     teacher: User = Depends(require_teacher),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
-    poll = (
-        db.query(Poll)
-        .join(Class)
-        .filter(Poll.id == poll_id, Class.teacher_id == teacher.id)
-        .first()
-    )
-
-    if not poll:
+    poll = db.query(Poll).filter(Poll.id == poll_id).first()
+    if not poll or not owns_class(db, poll.class_id, teacher):
         raise HTTPException(404, "Poll not found")
 
     options = db.query(PollOption).filter(PollOption.poll_id == poll_id).all()
-    total_votes = db.query(PollResponse).filter(PollResponse.poll_id == poll_id).count()
+
+    if poll.archived_at is not None:
+        tally = archived_poll_tally(db, poll_id)
+    else:
+        tally = dict(
+            db.query(PollResponse.option_id, func.count(PollResponse.id))
+            .filter(PollResponse.poll_id == poll_id)
+            .group_by(PollResponse.option_id)
+            .all()
+        )
+    total_votes = sum(tally.values())
 
     results = []
     for option in options:
-        votes = db.query(PollResponse).filter(PollResponse.option_id == option.id).count()
+        votes = tally.get(option.id, 0)
         percentage = (votes / total_votes * 100) if total_votes else 0
         results.append(
             {
@@ -199,6 +515,22 @@ def poll_results(
     return {"status": "success", "data": {"total_votes": total_votes, "results": results}}
 
 
+@router.delete("/polls/{poll_id}")
+def delete_poll(
+    poll_id: int,
+    teacher: User = Depends(require_teacher),
+    db: Session = Depends(get_db),
+):
+    poll = db.query(Poll.id, Poll.class_id).filter(Poll.id == poll_id).first()
+    if not poll or not owns_class(db, poll.class_id, teacher):
+        raise HTTPException(404, "Poll not found")
+
+    report = deletion.delete_poll(db, poll_id)
+    db.commit()
+    invalidate_teacher(teacher.id)
+    return {"status": "success", "message": "Poll deleted", "data": report}
+
+
 # --------------------------------------------------
 #                     QUIZZES
 # --------------------------------------------------
@@ -209,20 +541,14 @@ def create_quiz(
     teacher: User = Depends(require_teacher),
     db: Session = Depends(get_db),
 ):
-    cls = (
-        db.query(Class)
-        .filter(Class.id == payload.class_id, Class.teacher_id == teacher.id)
-        .first()
-    )
-
-    if not cls:
-        raise HTTPException(404, "Class not found or not owned by you")
+    require_class_owner(db, payload.class_id, teacher)
 
     quiz = Quiz(
         class_id=payload.class_id,
         title=payload.title,
         timer=payload.timer,
         status="draft",
+        question_count=len(payload.questions),
     )
     db.add(quiz)
     db.flush()
@@ -245,24 +571,35 @@ def create_quiz(
 
     db.commit()
     db.refresh(quiz)
+    invalidate_teacher(teacher.id)
 
     return {"status": "success", "data": {"quiz_id": quiz.id}}
 
 
+@router.post("/quizzes/import")
+def import_quiz_file(
+    file: UploadFile = File(...),
+    batch_size: int = Query(100, ge=1, le=1000),
+    teacher: User = Depends(require_teacher),
+    db: Session = Depends(get_db),
+):
+    # JSON array or NDJSON of QuizCreate documents, parsed incrementally
+    try:
+        report = import_quizzes(db, open_text(file.file), teacher.id, batch_size=batch_size)
+    finally:
+        invalidate_teacher(teacher.id)
+    return {"status": "success", "data": report}
+
+
 @router.get("/quizzes")
 def list_quizzes(
     teacher: User = Depends(require_teacher),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     quizzes = (
-        db.query(
-            Quiz,
-            func.count(QuizQuestion.id).label("question_count"),
-        )
+        db.query(Quiz)
         .join(Class, Quiz.class_id == Class.id)
-        .outerjoin(QuizQuestion, QuizQuestion.quiz_id == Quiz.id)
         .filter(Class.teacher_id == teacher.id)
-        .group_by(Quiz.id)
         .all()
     )
 
@@ -270,11 +607,11 @@ def list_quizzes(
         "status": "success",
         "data": [
             {
-                "id": q.Quiz.id,
-                "title": q.Quiz.title,
-                "class_id": q.Quiz.class_id,
-                "status": q.Quiz.status,
-                "timer": q.Quiz.timer,
+                "id": q.id,
+                "title": q.title,
+                "class_id": q.class_id,
+                "status": q.status,
+                "timer": q.timer,
                 "question_count": q.question_count,
             }
             for q in quizzes
@@ -289,21 +626,23 @@ def set_quiz_status(
     teacher: User = Depends(require_teacher),
     db: Session = Depends(get_db),
 ):
-    quiz = (
-        db.query(Quiz)
-        .join(Class)
-        .filter(Quiz.id == quiz_id, Class.teacher_id == teacher.id)
-        .first()
-    )
-
-    if not quiz:
+    quiz = db.query(Quiz).filter(Quiz.id == quiz_id).first()
+    if not quiz or not owns_class(db, quiz.class_id, teacher):
         raise HTTPException(404, "Quiz not found")
 
     if new_status not in ("draft", "live", "closed"):
         raise HTTPException(400, "Invalid status")
 
     quiz.status = new_status
+    quiz.closed_at = func.now() if new_status == "closed" else None
     db.commit()
+    invalidate_teacher(teacher.id)
+    invalidate_class(quiz.class_id)
+
+    # students fetch the paper all at once when a quiz opens; build it now
+    quiz_paper_cache.pop(quiz_id)
+    if new_status == "live":
+        quiz_paper_cache.get_or_set(quiz_id, lambda: build_paper(db, quiz_id))
     return {"status": "success", "message": f"Quiz status set to {new_status}"}
 
 
@@ -311,18 +650,15 @@ def set_quiz_status(
 def quiz_results(
     quiz_id: int,
     teacher: User = Depends(require_teacher),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
-    quiz = (
-        db.query(Quiz)
-        .join(Class)
-        .filter(Quiz.id == quiz_id, Class.teacher_id == teacher.id)
-        .first()
-    )
-
-    if not quiz:
+    quiz = db.query(Quiz).filter(Quiz.id == quiz_id).first()
+    if not quiz or not owns_class(db, quiz.class_id, teacher):
         raise HTTPException(404, "Quiz not found")
 
+    if quiz.archived_at is not None:
+        return {"status": "success", "data": archived_quiz_results(db, quiz_id)}
+
     questions = db.query(QuizQuestion).filter(QuizQuestion.quiz_id == quiz_id).all()
 
     student_ids = [
@@ -375,3 +711,26 @@ def quiz_results(
         )
 
     return {"status": "success", "data": results}
+
+
+@router.delete("/quizzes/{quiz_id}")
+def delete_quiz(
+    quiz_id: int,
+    teacher: User = Depends(require_teacher),
+    db: Session = Depends(get_db),
+):
+    quiz = db.query(Quiz.id, Quiz.class_id).filter(Quiz.id == quiz_id).first()
+    if not quiz or not owns_class(db, quiz.class_id, teacher):
+        raise HTTPException(404, "Quiz not found")
+
+    report = deletion.delete_quiz(db, quiz_id)
+    db.commit()
+
+    invalidate_teacher(teacher.id)
+    invalidate_class(quiz.class_id)
+    quiz_paper_cache.pop(quiz_id)
+    # stored submit results may point at the deleted quiz
+    idempotency_cache.clear()
+    leaderboards.load(db, quiz.class_id)
+
+    return {"status": "success", "message": "Quiz deleted", "data": report}
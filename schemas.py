@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr, Field
-from typing import Optional, List, Literal
+from typing import Any, Optional, List, Literal
 from datetime import datetime
 
 
@@ -43,6 +43,16 @@ class JoinClass(BaseModel):
     join_code: str
 
 
+class RosterStudentIn(BaseModel):
+    full_name: Optional[str] = None
+    email: EmailStr
+    password: str = Field(min_length=1)
+
+
+class RosterImport(BaseModel):
+    students: List[Any]  # validated row by row so one bad row doesn't fail the batch
+
+
 # -------------------- Polls --------------------
 
 class PollOptionIn(BaseModel):
@@ -0,0 +1,408 @@
+"""
+Query-plan regression check.
+
+Seeds a throwaway SQLite file, calls every router endpoint once, captures
+each SQL statement it issues and runs EXPLAIN QUERY PLAN on it. Fails if a
+statement full-scans one of the large tables without an allowlist entry,
+or if an endpoint is not exercised by the script.
+
+Before checking, a few known aliased scans are run through the scan
+detector itself (exit status 2 if any is missed).
+
+Run from the repository root (exit status 1 on regressions):
+
+    python scripts/check_query_plans.py [--db PATH] [--verbose]
+"""
+import argparse
+import asyncio
+import contextvars
+import json
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+import uuid
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+LARGE_TABLES = {"quiz_responses", "poll_responses", "class_members"}
+
+# (endpoint name, table) -> reason. Keep reasons specific; remove entries
+# once the query is fixed.
+ALLOWLIST = {
+}
+
+_endpoint: contextvars.ContextVar = contextvars.ContextVar("endpoint", default=None)
+
+
+# ---------------- ASGI CLIENT ---------------- #
+
+class Client:
+    """Just enough of an HTTP client to drive the ASGI app in-process."""
+
+    def __init__(self, app):
+        self.app = app
+        self.loop = asyncio.new_event_loop()
+        self.called = set()
+
+    def call(self, name: str, method: str, path: str, token=None, json_body=None,
+             files=None, query: str = "", headers=None):
+        self.called.add(name)
+        hdrs = [(b"host", b"plan-check")]
+        body = b""
+        if token:
+            hdrs.append((b"authorization", f"Bearer {token}".encode()))
+        for k, v in (headers or {}).items():
+            hdrs.append((k.lower().encode(), v.encode()))
+        if json_body is not None:
+            body = json.dumps(json_body).encode()
+            hdrs.append((b"content-type", b"application/json"))
+        elif files is not None:
+            boundary = uuid.uuid4().hex
+            parts = []
+            for field, (filename, content) in files.items():
+                parts.append(
+                    f"--{boundary}\r\nContent-Disposition: form-data; name=\"{field}\"; "
+                    f"filename=\"{filename}\"\r\nContent-Type: application/octet-stream\r\n\r\n".encode()
+                    + content + b"\r\n"
+                )
+            body = b"".join(parts) + f"--{boundary}--\r\n".encode()
+            hdrs.append((b"content-type", f"multipart/form-data; boundary={boundary}".encode()))
+        hdrs.append((b"content-length", str(len(body)).encode()))
+
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+            "method": method, "scheme": "http", "path": path, "raw_path": path.encode(),
+            "query_string": query.encode(), "root_path": "", "headers": hdrs,
+            "client": ("127.0.0.1", 1), "server": ("plan-check", 80),
+        }
+        messages = []
+        delivered = False
+
+        async def receive():
+            nonlocal delivered
+            if not delivered:
+                delivered = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            messages.append(message)
+
+        async def run():
+            token_ = _endpoint.set(name)
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                _endpoint.reset(token_)
+
+        self.loop.run_until_complete(run())
+        status = next(m["status"] for m in messages if m["type"] == "http.response.start")
+        raw = b"".join(m.get("body", b"") for m in messages if m["type"] == "http.response.body")
+        if status >= 400:
+            raise RuntimeError(f"{name}: {method} {path} -> {status} {raw[:200]!r}")
+        return json.loads(raw) if raw else None
+
+
+# ---------------- SEED + EXERCISE ---------------- #
+
+def seed_bulk(students: int, questions: int):
+    """Volume rows inserted directly, so plans are chosen against realistic tables."""
+    from sqlalchemy import insert, text
+    from database import engine
+    from models import (
+        User, Class, ClassMember, Poll, PollOption, PollResponse,
+        Quiz, QuizQuestion, QuizOption, QuizResponse,
+    )
+
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"id": 1000 + i, "email": f"bulk{i}@example.com", "password_hash": "x", "role": "student"}
+            for i in range(students)
+        ])
+        conn.execute(insert(User), [{"id": 999, "email": "bulkteacher@example.com",
+                                     "password_hash": "x", "role": "teacher"}])
+        conn.execute(insert(Class), [{"id": 900 + c, "teacher_id": 999, "class_name": f"Bulk {c}",
+                                      "join_code": f"BULK{c:02d}", "member_count": students}
+                                     for c in range(5)])
+        conn.execute(insert(ClassMember), [
+            {"class_id": 900 + c, "student_id": 1000 + i} for c in range(5) for i in range(students)
+        ])
+        conn.execute(insert(Quiz), [{"id": 900 + c, "class_id": 900 + c, "title": "Bulk",
+                                     "status": "closed", "question_count": questions,
+                                     "submission_count": students} for c in range(5)])
+        conn.execute(insert(QuizQuestion), [
+            {"id": 9000 + c * questions + q, "quiz_id": 900 + c, "question_text": "?",
+             "correct_option_id": 90000 + (c * questions + q) * 2}
+            for c in range(5) for q in range(questions)
+        ])
+        conn.execute(insert(QuizOption), [
+            {"id": 90000 + n * 2 + o, "question_id": 9000 + n, "option_text": str(o)}
+            for n in range(5 * questions) for o in range(2)
+        ])
+        conn.execute(insert(QuizResponse), [
+            {"quiz_id": 900 + c, "question_id": 9000 + c * questions + q,
+             "student_id": 1000 + i, "option_id": 90000 + (c * questions + q) * 2 + (i % 2)}
+            for c in range(5) for i in range(students) for q in range(questions)
+        ])
+        conn.execute(insert(Poll), [{"id": 900 + c, "class_id": 900 + c, "question": "?",
+                                     "status": "closed", "option_count": 2} for c in range(5)])
+        conn.execute(insert(PollOption), [
+            {"id": 9000 + c * 2 + o, "poll_id": 900 + c, "option_text": str(o)}
+            for c in range(5) for o in range(2)
+        ])
+        conn.execute(insert(PollResponse), [
+            {"poll_id": 900 + c, "student_id": 1000 + i, "option_id": 9000 + c * 2 + (i % 2)}
+            for c in range(5) for i in range(students)
+        ])
+        conn.execute(text("ANALYZE"))
+
+
+def exercise(client: Client, app):
+    url = app.url_path_for
+
+    def signup(email, role):
+        client.call("signup", "POST", url("signup"),
+                    json_body={"email": email, "password": "pw", "role": role})
+        return client.call("login", "POST", url("login"),
+                           json_body={"email": email, "password": "pw"})["access_token"]
+
+    teacher = signup("plan-teacher@example.com", "teacher")
+    student = signup("plan-student@example.com", "student")
+
+    cls = client.call("create_class", "POST", url("create_class"), teacher,
+                      {"class_name": "Plan"})["data"]
+    client.call("join_class", "POST", url("join_class"), student, {"join_code": cls["join_code"]})
+    client.call("list_classes", "GET", url("list_classes"), teacher)
+    client.call("get_my_classes", "GET", url("get_my_classes"), student)
+
+    client.call("import_roster", "POST", url("import_roster", class_id=cls["id"]), teacher,
+                {"students": [{"email": "plan-roster@example.com", "password": "pw"}]})
+    client.call("import_roster_csv", "POST", url("import_roster_csv", class_id=cls["id"]), teacher,
+                files={"file": ("r.csv", b"email,password\nplan-csv@example.com,pw\n")})
+
+    poll_id = client.call("create_poll", "POST", url("create_poll"), teacher, {
+        "class_id": cls["id"], "question": "?", "options": [{"option_text": "a"}, {"option_text": "b"}],
+    })["data"]["poll_id"]
+    client.call("list_polls", "GET", url("list_polls"), teacher)
+    client.call("set_poll_status", "PATCH", url("set_poll_status", poll_id=poll_id), teacher,
+                query="new_status=live")
+    client.call("poll_results", "GET", url("poll_results", poll_id=poll_id), teacher)
+
+    quiz = {
+        "class_id": cls["id"], "title": "Plan quiz",
+        "questions": [{"question_text": "1+1", "options": [{"option_text": "2"}, {"option_text": "3"}],
+                       "correct_option_index": 0}],
+    }
+    quiz_id = client.call("create_quiz", "POST", url("create_quiz"), teacher, quiz)["data"]["quiz_id"]
+    client.call("import_quiz_file", "POST", url("import_quiz_file"), teacher,
+                files={"file": ("q.ndjson", json.dumps(quiz).encode())})
+    client.call("list_quizzes", "GET", url("list_quizzes"), teacher)
+    client.call("get_my_quizzes", "GET", url("get_my_quizzes"), student)
+    client.call("set_quiz_status", "PATCH", url("set_quiz_status", quiz_id=quiz_id), teacher,
+                query="new_status=live")
+
+    from database import SessionLocal
+    from models import QuizQuestion, QuizOption
+    with SessionLocal() as db:
+        question = db.query(QuizQuestion).filter(QuizQuestion.quiz_id == quiz_id).first()
+        option = db.query(QuizOption).filter(QuizOption.question_id == question.id).first()
+        answer = {"question_id": question.id, "option_id": option.id}
+
+    client.call("get_quiz_paper", "GET", url("get_quiz_paper", quiz_id=quiz_id), student)
+    client.call("submit_quiz", "POST", url("submit_quiz", quiz_id=quiz_id), student,
+                {"answers": [answer]}, headers={"Idempotency-Key": "plan-check"})
+    client.call("my_quiz_result", "GET", url("my_quiz_result", quiz_id=quiz_id), student)
+    client.call("quiz_results", "GET", url("quiz_results", quiz_id=quiz_id), teacher)
+    client.call("dashboard", "GET", url("dashboard"), teacher)
+    client.call("gradebook", "GET", url("gradebook", class_id=cls["id"]), teacher)
+    client.call("my_gradebook", "GET", url("my_gradebook", class_id=cls["id"]), student)
+    client.call("class_leaderboard", "GET", url("class_leaderboard", class_id=cls["id"]), teacher)
+    client.call("my_leaderboard_rank", "GET", url("my_leaderboard_rank", class_id=cls["id"]), student)
+
+    # destructive calls last
+    client.call("delete_poll", "DELETE", url("delete_poll", poll_id=poll_id), teacher)
+    client.call("delete_quiz", "DELETE", url("delete_quiz", quiz_id=quiz_id), teacher)
+    client.call("delete_class", "DELETE", url("delete_class", class_id=cls["id"]), teacher)
+
+    admin = {"X-Admin-Token": os.environ["CLASSPULSE_ADMIN_TOKEN"]}
+    client.call("get_admission_metrics", "GET", url("get_admission_metrics"), headers=admin)
+    client.call("get_write_queue_metrics", "GET", url("get_write_queue_metrics"), headers=admin)
+    client.call("get_slow_queries", "GET", url("get_slow_queries"), headers=admin)
+    client.call("reset_slow_queries", "DELETE", url("reset_slow_queries"), headers=admin)
+    client.call("get_shards", "GET", url("get_shards"), headers=admin)
+    client.call("root", "GET", url("root"))
+
+
+# ---------------- PLAN CHECK ---------------- #
+
+_FROM_ITEM = re.compile(r'\b(?:FROM|JOIN)\s+"?(\w+)"?(?:\s+(?:AS\s+)?"?(\w+)"?)?', re.IGNORECASE)
+_NOT_ALIAS = {"WHERE", "ON", "USING", "JOIN", "LEFT", "RIGHT", "INNER", "OUTER", "CROSS",
+              "NATURAL", "GROUP", "ORDER", "LIMIT", "HAVING", "UNION", "EXCEPT", "INTERSECT",
+              "WINDOW", "SET", "RETURNING", "INDEXED", "NOT"}
+
+
+def _aliases(statement: str) -> dict:
+    """Map every FROM/JOIN alias in the statement to its table name."""
+    aliases = {}
+    for table, alias in _FROM_ITEM.findall(statement):
+        aliases[table] = table
+        if alias and alias.upper() not in _NOT_ALIAS:
+            aliases[alias] = table
+    return aliases
+
+
+def _scanned_tables(plan_rows, statement: str) -> set:
+    """Real table names full-scanned by a plan.
+
+    SQLite names an aliased table by its alias only (``SCAN qr1``; older
+    releases print ``SCAN TABLE quiz_responses AS qr1``), so aliases are
+    resolved against the statement's FROM/JOIN clauses.
+    """
+    aliases = _aliases(statement)
+    scanned = set()
+    for row in plan_rows:
+        words = row[-1].split()
+        if not words or words[0] != "SCAN" or len(words) < 2:
+            continue
+        if words[1] == "TABLE" and len(words) > 2:
+            words = words[1:]
+        name = words[1]
+        if len(words) > 3 and words[2] == "AS":
+            scanned.add(name)
+        else:
+            scanned.add(aliases.get(name, name))
+    return scanned
+
+
+# Aliased scans that the check must recognise; run before every check.
+SELF_CHECK_PLANS = [
+    ("SELECT * FROM quiz_responses AS qr1 WHERE qr1.score > 0", None),
+    ("SELECT quiz_responses_1.id FROM quiz_responses AS quiz_responses_1 "
+     "JOIN quizzes AS q ON q.id = quiz_responses_1.quiz_id", None),
+    ("SELECT * FROM quiz_responses qr WHERE qr.score > 0", None),
+    ("SELECT * FROM quiz_responses AS qr1", [(2, 0, 0, "SCAN TABLE quiz_responses AS qr1")]),
+]
+
+
+def self_check() -> list:
+    """Run the scan detector over known aliased scans; return the misses."""
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE quizzes (id INTEGER PRIMARY KEY)")
+    conn.execute("CREATE TABLE quiz_responses (id INTEGER PRIMARY KEY, quiz_id INTEGER, score INTEGER)")
+    misses = []
+    for statement, plan in SELF_CHECK_PLANS:
+        if plan is None:
+            plan = conn.execute(f"EXPLAIN QUERY PLAN {statement}").fetchall()
+        if "quiz_responses" not in _scanned_tables(plan, statement):
+            misses.append((statement, [r[-1] for r in plan]))
+    conn.close()
+    return misses
+
+
+def check(db_path: str, captured: list, verbose: bool) -> list:
+    conn = sqlite3.connect(db_path)
+    failures = []
+    seen = set()
+
+    for endpoint, statement, params in captured:
+        head = statement.lstrip().split(None, 1)[0].upper()
+        if head not in ("SELECT", "UPDATE", "DELETE", "WITH"):
+            continue
+        key = (endpoint, statement)
+        if key in seen:
+            continue
+        seen.add(key)
+
+        if isinstance(params, list):
+            params = params[0] if params else ()
+        plan = conn.execute(f"EXPLAIN QUERY PLAN {statement}", params or ()).fetchall()
+        if verbose:
+            print(f"[{endpoint}] {' '.join(statement.split())}")
+            for row in plan:
+                print(f"    {row[-1]}")
+
+        for table in _scanned_tables(plan, statement) & LARGE_TABLES:
+            if (endpoint, table) in ALLOWLIST:
+                continue
+            failures.append((endpoint, table, " ".join(statement.split()), [r[-1] for r in plan]))
+
+    conn.close()
+    return failures
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", help="SQLite file to create (default: a temp file)")
+    parser.add_argument("--students", type=int, default=200)
+    parser.add_argument("--questions", type=int, default=10)
+    parser.add_argument("--verbose", action="store_true", help="Print every statement and its plan")
+    args = parser.parse_args()
+
+    misses = self_check()
+    for statement, plan in misses:
+        print(f"SELF-CHECK: aliased scan of quiz_responses not detected:\n    {statement}")
+        for line in plan:
+            print(f"      {line}")
+    if misses:
+        return 2
+
+    tmp = None
+    db_path = args.db
+    if db_path is None:
+        tmp = tempfile.TemporaryDirectory()
+        db_path = os.path.join(tmp.name, "plans.db")
+    if os.path.exists(db_path):
+        os.remove(db_path)
+
+    # settings are read at import time, so configure before importing the app
+    os.environ["CLASSPULSE_DATABASE_PATH"] = db_path
+    os.environ["CLASSPULSE_ADMISSION_ENABLED"] = "false"
+    os.environ.setdefault("CLASSPULSE_ADMIN_TOKEN", "plan-check")
+
+    from sqlalchemy import event
+    from database import engine, read_engine
+    from main import app
+
+    seed_bulk(args.students, args.questions)
+
+    captured = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        endpoint = _endpoint.get()
+        if endpoint is not None:
+            captured.append((endpoint, statement, parameters))
+
+    for eng in (engine, read_engine):
+        event.listen(eng, "before_cursor_execute", record)
+
+    client = Client(app)
+    exercise(client, app)
+
+    routes = {r.name for r in app.routes if hasattr(r, "endpoint") and r.name not in
+              ("openapi", "swagger_ui_html", "swagger_ui_redirect", "redoc_html")}
+    missing = sorted(routes - client.called)
+
+    failures = check(db_path, captured, args.verbose)
+
+    for endpoint, table, statement, plan in failures:
+        print(f"FULL SCAN of {table} in {endpoint}:\n    {statement}")
+        for line in plan:
+            print(f"      {line}")
+    for name in missing:
+        print(f"NOT EXERCISED: endpoint {name} has no call in scripts/check_query_plans.py")
+
+    print(f"{len(captured)} statements from {len(client.called)} endpoints; "
+          f"{len(failures)} full scans, {len(missing)} unexercised endpoints")
+
+    if tmp is not None:
+        engine.dispose()
+        read_engine.dispose()
+        tmp.cleanup()
+    return 1 if failures or missing else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
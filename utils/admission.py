@@ -0,0 +1,245 @@
+import asyncio
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from starlette.routing import Match
+
+from config import RouteLimit, settings
+from database import current_school
+from utils.jwt_utils import decode_access_token
+
+
+# ---------------- TOKEN BUCKETS ---------------- #
+
+class TokenBuckets:
+    """Keyed token buckets, bounded to the most recently used keys."""
+
+    def __init__(self, rate: float, burst: int, max_keys: int):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[object, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key) -> float:
+        """Take one token for `key`. Returns 0 on success, else seconds until one is available."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, stamp = self._buckets.pop(key, (float(self.burst), now))
+            tokens = min(float(self.burst), tokens + (now - stamp) * self.rate)
+
+            if tokens >= 1:
+                wait = 0.0
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / self.rate
+
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+
+        return wait
+
+
+# ---------------- CONCURRENCY ---------------- #
+
+class ConcurrencyLimiter:
+    """Caps in-flight requests; a bounded number may wait briefly for a slot."""
+
+    def __init__(self, limit: int, max_queue: int, timeout: float):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.in_flight = 0
+        self.waiting = 0
+        self._sem: Optional[asyncio.Semaphore] = None
+
+    async def acquire(self) -> bool:
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(self.limit)
+
+        if self._sem.locked() and self.waiting >= self.max_queue:
+            return False
+
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._sem.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self.waiting -= 1
+
+        self.in_flight += 1
+        return True
+
+    def release(self):
+        self.in_flight -= 1
+        self._sem.release()
+
+
+# ---------------- PER-ROUTE STATE ---------------- #
+
+class RouteAdmission:
+    def __init__(self, name: str, limit: RouteLimit, max_keys: int):
+        self.name = name
+        self.limit = limit
+        self.concurrency = ConcurrencyLimiter(
+            limit.max_concurrency, limit.max_queue, limit.queue_timeout
+        )
+        self.user_buckets = (
+            TokenBuckets(limit.user_rate, limit.user_burst, max_keys)
+            if limit.user_rate else None
+        )
+        self.class_buckets = (
+            TokenBuckets(limit.class_rate, limit.class_burst, max_keys)
+            if limit.class_rate else None
+        )
+        self.admitted = 0
+        self.shed_concurrency = 0
+        self.shed_user_rate = 0
+        self.shed_class_rate = 0
+
+    def metrics(self) -> dict:
+        return {
+            "in_flight": self.concurrency.in_flight,
+            "queue_depth": self.concurrency.waiting,
+            "max_concurrency": self.limit.max_concurrency,
+            "max_queue": self.limit.max_queue,
+            "admitted": self.admitted,
+            "shed": {
+                "concurrency": self.shed_concurrency,
+                "user_rate": self.shed_user_rate,
+                "class_rate": self.shed_class_rate,
+            },
+        }
+
+
+_routes: Dict[str, RouteAdmission] = {
+    name: RouteAdmission(name, limit, settings.admission_max_keys)
+    for name, limit in settings.admission_routes.items()
+}
+
+
+def _retry_after(seconds: float) -> str:
+    return str(max(1, math.ceil(seconds)))
+
+
+def admission_metrics() -> dict:
+    return {name: route.metrics() for name, route in _routes.items()}
+
+
+def check_user_rate(route_name: str, key):
+    """Per-user token bucket for routes without a token, called from the handler."""
+    route = _routes.get(route_name)
+    if not settings.admission_enabled or route is None or route.user_buckets is None:
+        return
+
+    wait = route.user_buckets.take((current_school(), key))
+    if wait:
+        route.shed_user_rate += 1
+        raise HTTPException(
+            status_code=429,
+            detail="Too many requests, retry shortly",
+            headers={"Retry-After": _retry_after(wait)},
+        )
+
+
+def check_class_rate(route_name: str, class_id: int):
+    """Per-class token bucket, called from a handler once it knows the class."""
+    route = _routes.get(route_name)
+    if not settings.admission_enabled or route is None or route.class_buckets is None:
+        return
+
+    wait = route.class_buckets.take((current_school(), class_id))
+    if wait:
+        route.shed_class_rate += 1
+        raise HTTPException(
+            status_code=429,
+            detail="Too many requests for this class, retry shortly",
+            headers={"Retry-After": _retry_after(wait)},
+        )
+
+
+# ---------------- MIDDLEWARE ---------------- #
+
+def _endpoint_name(app, scope) -> Optional[str]:
+    for route in app.router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, "name", None)
+    return None
+
+
+def _user_key(scope):
+    # Cheap identity for rate limiting: the token's school and user_id. Requests
+    # without a token share no key; a client address would lump together a
+    # whole classroom behind one NAT.
+    for name, value in scope.get("headers", []):
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() == "bearer" and token:
+                try:
+                    claims = decode_access_token(token)
+                    return ("user", claims.get("school"), claims.get("user_id"))
+                except Exception:
+                    return None
+            return None
+    return None
+
+
+class AdmissionControlMiddleware:
+    """Sheds load on configured routes with a fast 429/503 instead of queuing."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.admission_enabled:
+            await self.app(scope, receive, send)
+            return
+
+        route = self._route_for(scope)
+        if route is None:
+            await self.app(scope, receive, send)
+            return
+
+        user_key = _user_key(scope) if route.user_buckets is not None else None
+        if user_key is not None:
+            wait = route.user_buckets.take(user_key)
+            if wait:
+                route.shed_user_rate += 1
+                response = JSONResponse(
+                    status_code=429,
+                    content={"detail": "Too many requests, retry shortly"},
+                    headers={"Retry-After": _retry_after(wait)},
+                )
+                await response(scope, receive, send)
+                return
+
+        if not await route.concurrency.acquire():
+            route.shed_concurrency += 1
+            response = JSONResponse(
+                status_code=503,
+                content={"detail": "Server busy, retry shortly"},
+                headers={"Retry-After": _retry_after(route.limit.queue_timeout)},
+            )
+            await response(scope, receive, send)
+            return
+
+        route.admitted += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            route.concurrency.release()
+
+    def _route_for(self, scope) -> Optional[RouteAdmission]:
+        app = scope.get("app")
+        if app is None:
+            return None
+        name = _endpoint_name(app, scope)
+        return _routes.get(name) if name else None
@@ -0,0 +1,164 @@
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from config import settings
+from models import (
+    IdempotencyKey,
+    Poll,
+    PollResponse,
+    PollTallyArchive,
+    Quiz,
+    QuizQuestion,
+    QuizResponse,
+    QuizResultArchive,
+)
+
+
+# ---------------- ARCHIVAL JOB ---------------- #
+
+def _archive_quiz(db: Session, quiz_id: int) -> int:
+    questions = db.execute(
+        select(QuizQuestion.id, QuizQuestion.correct_option_id)
+        .where(QuizQuestion.quiz_id == quiz_id)
+        .order_by(QuizQuestion.id)
+    ).all()
+    position = {q.id: i for i, q in enumerate(questions)}
+
+    # first response per (student, question) counts, as in the live scoring
+    answers: Dict[int, Dict[int, int]] = {}
+    for student_id, question_id, option_id in db.execute(
+        select(QuizResponse.student_id, QuizResponse.question_id, QuizResponse.option_id)
+        .where(QuizResponse.quiz_id == quiz_id)
+        .order_by(QuizResponse.id)
+    ):
+        answers.setdefault(student_id, {}).setdefault(question_id, option_id)
+
+    rows = []
+    for student_id, chosen in answers.items():
+        mask = ["0"] * len(questions)
+        for question_id, option_id in chosen.items():
+            i = position.get(question_id)
+            if i is not None and questions[i].correct_option_id is not None \
+                    and option_id == questions[i].correct_option_id:
+                mask[i] = "1"
+        rows.append({
+            "quiz_id": quiz_id,
+            "student_id": student_id,
+            "score": mask.count("1"),
+            "total": len(questions),
+            "correct_mask": "".join(mask),
+        })
+
+    if rows:
+        db.execute(insert(QuizResultArchive), rows)
+    db.execute(delete(QuizResponse).where(QuizResponse.quiz_id == quiz_id))
+    # an archived quiz takes no more submissions, so no retry needs replaying
+    db.execute(delete(IdempotencyKey).where(IdempotencyKey.quiz_id == quiz_id))
+    db.execute(update(Quiz).where(Quiz.id == quiz_id).values(archived_at=func.now()))
+    return len(rows)
+
+
+def _archive_poll(db: Session, poll_id: int) -> int:
+    tally = db.execute(
+        select(PollResponse.option_id, func.count(PollResponse.id))
+        .where(PollResponse.poll_id == poll_id)
+        .group_by(PollResponse.option_id)
+    ).all()
+
+    if tally:
+        db.execute(insert(PollTallyArchive), [
+            {"poll_id": poll_id, "option_id": option_id, "votes": votes}
+            for option_id, votes in tally
+        ])
+    db.execute(delete(PollResponse).where(PollResponse.poll_id == poll_id))
+    db.execute(update(Poll).where(Poll.id == poll_id).values(archived_at=func.now()))
+    return len(tally)
+
+
+def archive_closed(db: Session, older_than_days: int, dry_run: bool = False) -> dict:
+    """
+    Summarize and drop the responses of quizzes and polls closed more than
+    `older_than_days` ago. Each item is archived in its own transaction.
+    Idempotency keys past `idempotency_key_retention_days` are expired too.
+    """
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    cutoff = now - timedelta(days=older_than_days)
+    key_cutoff = now - timedelta(days=settings.idempotency_key_retention_days)
+
+    # items closed before closed_at was recorded fall back to created_at
+    quiz_ids = db.scalars(
+        select(Quiz.id).where(
+            Quiz.status == "closed",
+            Quiz.archived_at.is_(None),
+            func.coalesce(Quiz.closed_at, Quiz.created_at) < cutoff,
+        )
+    ).all()
+    poll_ids = db.scalars(
+        select(Poll.id).where(
+            Poll.status == "closed",
+            Poll.archived_at.is_(None),
+            func.coalesce(Poll.closed_at, Poll.created_at) < cutoff,
+        )
+    ).all()
+
+    report = {"quizzes": len(quiz_ids), "polls": len(poll_ids), "students": 0, "options": 0}
+    if dry_run:
+        report["idempotency_keys"] = db.scalar(
+            select(func.count()).where(IdempotencyKey.created_at < key_cutoff)
+        )
+        return report
+
+    report["idempotency_keys"] = db.execute(
+        delete(IdempotencyKey).where(IdempotencyKey.created_at < key_cutoff)
+    ).rowcount
+    db.commit()
+
+    for quiz_id in quiz_ids:
+        report["students"] += _archive_quiz(db, quiz_id)
+        db.commit()
+    for poll_id in poll_ids:
+        report["options"] += _archive_poll(db, poll_id)
+        db.commit()
+
+    return report
+
+
+# ---------------- ARCHIVE READS ---------------- #
+
+def archived_quiz_results(
+    db: Session, quiz_id: int, student_id: Optional[int] = None
+) -> List[dict]:
+    """Rebuild result payloads (score/total/percentage/details) from the archive."""
+    question_ids = db.scalars(
+        select(QuizQuestion.id).where(QuizQuestion.quiz_id == quiz_id).order_by(QuizQuestion.id)
+    ).all()
+
+    query = select(QuizResultArchive).where(QuizResultArchive.quiz_id == quiz_id)
+    if student_id is not None:
+        query = query.where(QuizResultArchive.student_id == student_id)
+
+    results = []
+    for row in db.scalars(query):
+        results.append({
+            "student_id": row.student_id,
+            "score": row.score,
+            "total": row.total,
+            "percentage": (row.score / row.total * 100) if row.total else 0,
+            "details": [
+                {"question_id": qid, "correct": flag == "1"}
+                for qid, flag in zip(question_ids, row.correct_mask)
+            ],
+        })
+    return results
+
+
+def archived_poll_tally(db: Session, poll_id: int) -> Dict[int, int]:
+    return dict(
+        db.execute(
+            select(PollTallyArchive.option_id, PollTallyArchive.votes)
+            .where(PollTallyArchive.poll_id == poll_id)
+        ).all()
+    )
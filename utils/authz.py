@@ -0,0 +1,53 @@
+from typing import Optional
+
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from models import Class, ClassMember, User
+from utils.cache import class_owner_cache, membership_cache
+
+
+def class_owner(db: Session, class_id: int) -> Optional[int]:
+    """teacher_id of the class, or None if it does not exist."""
+    return class_owner_cache.get_or_set(
+        class_id,
+        lambda: db.execute(select(Class.teacher_id).where(Class.id == class_id)).scalar(),
+    )
+
+
+def owns_class(db: Session, class_id: int, teacher: User) -> bool:
+    return class_owner(db, class_id) == teacher.id
+
+
+def require_class_owner(
+    db: Session,
+    class_id: int,
+    teacher: User,
+    detail: str = "Class not found or not owned by you",
+) -> None:
+    if not owns_class(db, class_id, teacher):
+        raise HTTPException(status_code=404, detail=detail)
+
+
+def _membership(db: Session, class_id: int, student_id: int) -> Optional[bool]:
+    found = db.execute(
+        select(ClassMember.id).where(
+            ClassMember.class_id == class_id,
+            ClassMember.student_id == student_id,
+        )
+    ).first()
+    return True if found is not None else None
+
+
+def is_member(db: Session, class_id: int, student_id: int) -> bool:
+    # Only memberships are cached (get_or_set skips None): a student who
+    # joins through another worker process must not be refused meanwhile.
+    return bool(membership_cache.get_or_set(
+        (class_id, student_id), lambda: _membership(db, class_id, student_id)
+    ))
+
+
+def require_member(db: Session, class_id: int, student: User) -> None:
+    if not is_member(db, class_id, student.id):
+        raise HTTPException(status_code=403, detail="Not a member of this class")
@@ -0,0 +1,149 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from config import settings
+from database import current_school
+
+
+class TTLCache:
+    """
+    Small thread-safe LRU cache whose entries also expire after `ttl` seconds.
+    With a tenant shard bound, keys are scoped to its school, so the same id
+    in two schools never shares an entry.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._items: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # bumped on every invalidation so get_or_set never stores a value
+        # computed before a concurrent write invalidated it
+        self._generation = 0
+
+    @staticmethod
+    def _key(key: Hashable) -> Hashable:
+        school = current_school()
+        return key if school is None else (_SCHOOL, school, key)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        key = self._key(key)
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return default
+            expires, value = item
+            if expires < time.monotonic():
+                del self._items[key]
+                return default
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._store(self._key(key), value)
+
+    def _store(self, key: Hashable, value: Any) -> None:
+        self._items[key] = (time.monotonic() + self.ttl, value)
+        self._items.move_to_end(key)
+        while len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        with self._lock:
+            self._generation += 1
+            self._items.pop(self._key(key), None)
+
+    def pop_where(self, predicate: Callable[[Hashable], bool]) -> None:
+        """Drop the current school's entries whose (unscoped) key matches."""
+        school = current_school()
+        with self._lock:
+            self._generation += 1
+            for key in [k for k in self._items if _in_scope(k, school, predicate)]:
+                del self._items[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._items.clear()
+
+    def get_or_set(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        """Return the cached value or compute it; a None result is not cached."""
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        generation = self._generation
+        value = factory()
+        with self._lock:
+            if value is not None and generation == self._generation:
+                self._store(self._key(key), value)
+        return value
+
+
+_MISSING = object()
+_SCHOOL = object()
+
+
+def _in_scope(key: Hashable, school: Optional[str], predicate: Callable[[Hashable], bool]) -> bool:
+    scoped = isinstance(key, tuple) and len(key) == 3 and key[0] is _SCHOOL
+    if school is None:
+        return not scoped and predicate(key)
+    return scoped and key[1] == school and predicate(key[2])
+
+
+# teacher_id -> dashboard payload
+dashboard_cache = TTLCache(maxsize=1024, ttl=settings.dashboard_cache_ttl)
+
+
+def invalidate_teacher(teacher_id: Optional[int]) -> None:
+    if teacher_id is not None:
+        dashboard_cache.pop(teacher_id)
+
+
+# (student_id, Idempotency-Key) -> (quiz_id, submit response)
+idempotency_cache = TTLCache(maxsize=10_000, ttl=settings.idempotency_cache_ttl)
+
+
+# quiz_id -> QuizPaper, for live quizzes only; dropped on every status change
+quiz_paper_cache = TTLCache(maxsize=settings.quiz_paper_cache_entries, ttl=settings.quiz_paper_cache_ttl)
+
+
+# (class_id, class version, student_id or None) -> gradebook payload. Bumping
+# the class version orphans every entry of that class in O(1); they age out.
+gradebook_cache = TTLCache(maxsize=settings.gradebook_cache_entries, ttl=settings.gradebook_cache_ttl)
+_class_versions: Dict[Tuple[Optional[str], int], int] = {}
+_class_versions_lock = threading.Lock()
+
+
+def class_version(class_id: int) -> int:
+    return _class_versions.get((current_school(), class_id), 0)
+
+
+def invalidate_class(class_id: Optional[int]) -> None:
+    if class_id is not None:
+        key = (current_school(), class_id)
+        with _class_versions_lock:
+            _class_versions[key] = _class_versions.get(key, 0) + 1
+
+
+# class_id -> teacher_id, and (class_id, student_id) -> True for members. Both are
+# dropped when a class is created or deleted and when members are added.
+class_owner_cache = TTLCache(maxsize=settings.authz_cache_entries, ttl=settings.authz_cache_ttl)
+membership_cache = TTLCache(maxsize=settings.authz_cache_entries, ttl=settings.authz_cache_ttl)
+
+
+def invalidate_membership(class_id: int, student_id: Optional[int] = None) -> None:
+    if student_id is not None:
+        membership_cache.pop((class_id, student_id))
+    else:
+        membership_cache.pop_where(lambda key: key[0] == class_id)
+
+
+def invalidate_class_authz(class_id: Optional[int]) -> None:
+    # classes use AUTOINCREMENT, so a cached id never points at a newer class
+    if class_id is not None:
+        class_owner_cache.pop(class_id)
+        invalidate_membership(class_id)
@@ -0,0 +1,90 @@
+from sqlalchemy import distinct, func, select, update
+from sqlalchemy.orm import Session
+
+from models import (
+    Class,
+    ClassMember,
+    Poll,
+    PollOption,
+    Quiz,
+    QuizQuestion,
+    QuizResponse,
+    QuizResultArchive,
+)
+
+
+# (label, model, counter column, correlated subquery computing the true value)
+COUNTERS = [
+    (
+        "classes.member_count",
+        Class,
+        Class.member_count,
+        select(func.count(ClassMember.id)).where(ClassMember.class_id == Class.id).scalar_subquery(),
+    ),
+    (
+        "polls.option_count",
+        Poll,
+        Poll.option_count,
+        select(func.count(PollOption.id)).where(PollOption.poll_id == Poll.id).scalar_subquery(),
+    ),
+    (
+        "quizzes.question_count",
+        Quiz,
+        Quiz.question_count,
+        select(func.count(QuizQuestion.id)).where(QuizQuestion.quiz_id == Quiz.id).scalar_subquery(),
+    ),
+    (
+        "quizzes.submission_count",
+        Quiz,
+        Quiz.submission_count,
+        # archived quizzes have no responses left; count their summary rows
+        select(func.count(distinct(QuizResponse.student_id)))
+        .where(QuizResponse.quiz_id == Quiz.id)
+        .scalar_subquery()
+        + select(func.count(QuizResultArchive.id))
+        .where(QuizResultArchive.quiz_id == Quiz.id)
+        .scalar_subquery(),
+    ),
+]
+
+
+# ---------------- WRITE-PATH HELPERS ---------------- #
+
+def bump(db: Session, column, row_id: int, delta: int = 1):
+    """Atomically adjust a counter column in the current transaction."""
+    model = column.class_
+    db.execute(
+        update(model)
+        .where(model.id == row_id)
+        .values({column.key: column + delta})
+        .execution_options(synchronize_session=False)
+    )
+
+
+# ---------------- CONSISTENCY CHECK ---------------- #
+
+def check_counters(db: Session, repair: bool = False) -> list:
+    """
+    Compare every counter column with its source rows. Returns the
+    mismatches found; with `repair`, also rewrites them and commits.
+    """
+    mismatches = []
+    for label, model, column, actual in COUNTERS:
+        rows = db.execute(
+            select(model.id, column, actual.label("actual")).where(column != actual)
+        ).all()
+        mismatches.extend(
+            {"counter": label, "id": r.id, "stored": r[1], "actual": r.actual} for r in rows
+        )
+
+        if repair and rows:
+            db.execute(
+                update(model)
+                .where(column != actual)
+                .values({column.key: actual})
+                .execution_options(synchronize_session=False)
+            )
+
+    if repair:
+        db.commit()
+    return mismatches
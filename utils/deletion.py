@@ -0,0 +1,95 @@
+from typing import List
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from models import (
+    Class,
+    ClassMember,
+    IdempotencyKey,
+    Poll,
+    PollOption,
+    PollResponse,
+    PollTallyArchive,
+    Quiz,
+    QuizOption,
+    QuizQuestion,
+    QuizResponse,
+    QuizResultArchive,
+)
+
+# Deletes run as a handful of set-based DELETE statements, children first,
+# so no rows are loaded into the session and a large class costs the same
+# memory as an empty one. Parent ids are passed as plain lists: with an
+# IN (SELECT ...) SQLite may decide to scan the response tables instead of
+# seeking their quiz_id/poll_id indexes. The existing SQLite tables were
+# created without ON DELETE clauses, which cannot be added in place, so the
+# cascade lives here rather than in the schema.
+
+# stays well below SQLite's bound-parameter limit
+CHUNK_SIZE = 500
+
+
+def _run(db: Session, report: dict, label: str, statement):
+    result = db.execute(statement.execution_options(synchronize_session=False))
+    report[label] = report.get(label, 0) + result.rowcount
+
+
+def _chunks(ids: List[int]):
+    for start in range(0, len(ids), CHUNK_SIZE):
+        yield ids[start:start + CHUNK_SIZE]
+
+
+def delete_quizzes(db: Session, quiz_ids: List[int], report: dict) -> dict:
+    """Delete the given quizzes and everything under them."""
+    for chunk in _chunks(quiz_ids):
+        _delete_quizzes(db, chunk, report)
+    return report
+
+
+def _delete_quizzes(db: Session, quiz_ids: List[int], report: dict):
+    question_ids = select(QuizQuestion.id).where(QuizQuestion.quiz_id.in_(quiz_ids))
+
+    _run(db, report, "quiz_responses", delete(QuizResponse).where(QuizResponse.quiz_id.in_(quiz_ids)))
+    _run(db, report, "quiz_results_archive",
+         delete(QuizResultArchive).where(QuizResultArchive.quiz_id.in_(quiz_ids)))
+    _run(db, report, "idempotency_keys",
+         delete(IdempotencyKey).where(IdempotencyKey.quiz_id.in_(quiz_ids)))
+    _run(db, report, "quiz_options", delete(QuizOption).where(QuizOption.question_id.in_(question_ids)))
+    _run(db, report, "quiz_questions", delete(QuizQuestion).where(QuizQuestion.quiz_id.in_(quiz_ids)))
+    _run(db, report, "quizzes", delete(Quiz).where(Quiz.id.in_(quiz_ids)))
+
+
+def delete_polls(db: Session, poll_ids: List[int], report: dict) -> dict:
+    """Delete the given polls and everything under them."""
+    for chunk in _chunks(poll_ids):
+        _delete_polls(db, chunk, report)
+    return report
+
+
+def _delete_polls(db: Session, poll_ids: List[int], report: dict):
+    _run(db, report, "poll_responses", delete(PollResponse).where(PollResponse.poll_id.in_(poll_ids)))
+    _run(db, report, "poll_tallies_archive",
+         delete(PollTallyArchive).where(PollTallyArchive.poll_id.in_(poll_ids)))
+    _run(db, report, "poll_options", delete(PollOption).where(PollOption.poll_id.in_(poll_ids)))
+    _run(db, report, "polls", delete(Poll).where(Poll.id.in_(poll_ids)))
+
+
+def delete_class(db: Session, class_id: int) -> dict:
+    """Delete a class with its members, polls and quizzes. Does not commit."""
+    report: dict = {}
+    delete_quizzes(db, db.scalars(select(Quiz.id).where(Quiz.class_id == class_id)).all(), report)
+    delete_polls(db, db.scalars(select(Poll.id).where(Poll.class_id == class_id)).all(), report)
+    _run(db, report, "class_members", delete(ClassMember).where(ClassMember.class_id == class_id))
+    _run(db, report, "classes", delete(Class).where(Class.id == class_id))
+    return report
+
+
+def delete_quiz(db: Session, quiz_id: int) -> dict:
+    """Delete one quiz with its questions, responses and archived results. Does not commit."""
+    return delete_quizzes(db, [quiz_id], {})
+
+
+def delete_poll(db: Session, poll_id: int) -> dict:
+    """Delete one poll with its options, responses and archived tally. Does not commit."""
+    return delete_polls(db, [poll_id], {})
@@ -0,0 +1,157 @@
+from typing import Optional
+
+from sqlalchemy import case, func, literal, null, select, union_all
+from sqlalchemy.orm import Session
+
+from models import ClassMember, Quiz, QuizQuestion, QuizResponse, QuizResultArchive, User
+
+# drafts are not visible to students yet, so they get no gradebook column
+GRADED_STATUSES = ("live", "closed")
+
+
+def _scores(class_id: int, student_id: Optional[int] = None):
+    """(quiz_id, student_id, score) for every submission in the class, live or archived."""
+    # an IN over the class's quiz ids lets SQLite seek the quiz_id indexes
+    # instead of scanning responses and probing quizzes
+    class_quizzes = select(Quiz.id).where(Quiz.class_id == class_id)
+
+    def scoped(query, model):
+        query = query.where(model.quiz_id.in_(class_quizzes))
+        if student_id is not None:
+            query = query.where(model.student_id == student_id)
+        return query
+
+    # only the first response per (student, question) counts, as in submit_quiz
+    first = scoped(
+        select(func.min(QuizResponse.id).label("id"))
+        .group_by(QuizResponse.quiz_id, QuizResponse.student_id, QuizResponse.question_id),
+        QuizResponse,
+    ).subquery()
+
+    live = (
+        select(
+            QuizResponse.quiz_id,
+            QuizResponse.student_id,
+            func.sum(case((QuizResponse.option_id == QuizQuestion.correct_option_id, 1), else_=0))
+            .label("score"),
+        )
+        .join(first, first.c.id == QuizResponse.id)
+        .join(QuizQuestion, (QuizQuestion.id == QuizResponse.question_id)
+              & (QuizQuestion.quiz_id == QuizResponse.quiz_id))
+        .group_by(QuizResponse.quiz_id, QuizResponse.student_id)
+    )
+
+    archived = scoped(
+        select(QuizResultArchive.quiz_id, QuizResultArchive.student_id, QuizResultArchive.score),
+        QuizResultArchive,
+    )
+
+    return union_all(live, archived).subquery()
+
+
+def _graded_quizzes(class_id: int, scores):
+    return (
+        select(
+            Quiz.id, Quiz.title, Quiz.status, Quiz.question_count,
+            scores.c.student_id, scores.c.score,
+        )
+        .outerjoin(scores, scores.c.quiz_id == Quiz.id)
+        .where(Quiz.class_id == class_id, Quiz.status.in_(GRADED_STATUSES))
+        .order_by(Quiz.id)
+    )
+
+
+def _percentage(score: int, total: int) -> float:
+    return (score / total * 100) if total else 0
+
+
+def student_gradebook(db: Session, class_id: int, student_id: int) -> dict:
+    """One student's score on every graded quiz in the class."""
+    quizzes = []
+    taken = score_sum = total_sum = 0
+
+    for row in db.execute(_graded_quizzes(class_id, _scores(class_id, student_id))):
+        submitted = row.score is not None
+        quizzes.append({
+            "quiz_id": row.id,
+            "title": row.title,
+            "status": row.status,
+            "submitted": submitted,
+            "score": row.score,
+            "total": row.question_count,
+            "percentage": _percentage(row.score, row.question_count) if submitted else None,
+        })
+        if submitted:
+            taken += 1
+            score_sum += row.score
+            total_sum += row.question_count
+
+    return {
+        "class_id": class_id,
+        "quizzes": quizzes,
+        "summary": {
+            "taken": taken,
+            "score": score_sum,
+            "total": total_sum,
+            "percentage": _percentage(score_sum, total_sum),
+        },
+    }
+
+
+def class_gradebook(db: Session, class_id: int) -> dict:
+    """Students x quizzes score matrix for a class; None where not submitted."""
+    # one statement: the quiz/score rows (kind 0) followed by the member
+    # rows (kind 1), each in the order the matrix is built
+    scores = _scores(class_id)
+    graded = (
+        select(
+            literal(0).label("kind"),
+            Quiz.id.label("quiz_id"), Quiz.title, Quiz.status, Quiz.question_count,
+            scores.c.student_id, scores.c.score,
+            null().label("full_name"), null().label("email"),
+        )
+        .outerjoin(scores, scores.c.quiz_id == Quiz.id)
+        .where(Quiz.class_id == class_id, Quiz.status.in_(GRADED_STATUSES))
+    )
+    members = (
+        select(
+            literal(1), null(), null(), null(), null(),
+            ClassMember.student_id, null(),
+            User.full_name, User.email,
+        )
+        .join(User, User.id == ClassMember.student_id)
+        .where(ClassMember.class_id == class_id)
+    )
+    rows = union_all(graded, members).subquery()
+    query = select(rows).order_by(rows.c.kind, rows.c.quiz_id, rows.c.full_name, rows.c.email)
+
+    quizzes = []
+    columns = {}
+    cells = {}
+    students = []
+
+    for row in db.execute(query):
+        if row.kind == 0:
+            if row.quiz_id not in columns:
+                columns[row.quiz_id] = len(quizzes)
+                quizzes.append({
+                    "quiz_id": row.quiz_id,
+                    "title": row.title,
+                    "status": row.status,
+                    "total": row.question_count,
+                })
+            if row.student_id is not None:
+                cells[(row.student_id, columns[row.quiz_id])] = row.score
+            continue
+
+        marks = [cells.get((row.student_id, i)) for i in range(len(quizzes))]
+        taken = [(s, q["total"]) for s, q in zip(marks, quizzes) if s is not None]
+        students.append({
+            "student_id": row.student_id,
+            "full_name": row.full_name,
+            "email": row.email,
+            "scores": marks,
+            "percentage": _percentage(sum(s for s, _ in taken), sum(t for _, t in taken)),
+        })
+
+    return {"class_id": class_id, "quizzes": quizzes, "students": students}
@@ -1,5 +1,13 @@
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import os
+import threading
+from typing import Iterable, List, Optional
+
 from passlib.context import CryptContext
 
+from config import settings
+
 # Use Argon2 instead of bcrypt
 pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
 
@@ -10,3 +18,31 @@ def hash_password(password: str) -> str:
 def verify_password(plain: str, hashed: str) -> bool:
     """Verify a password against a hashed value using Argon2."""
     return pwd_context.verify(plain, hashed)
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn, not fork: the server process is multi-threaded
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.hash_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def hash_passwords(passwords: Iterable[str]) -> List[str]:
+    """Hash many passwords in parallel on a process pool, preserving order."""
+    passwords = list(passwords)
+    if len(passwords) < 2:
+        return [hash_password(p) for p in passwords]
+
+    pool = _get_pool()
+    workers = settings.hash_workers or os.cpu_count() or 1
+    chunksize = max(1, len(passwords) // (workers * 4))
+    return list(pool.map(hash_password, passwords, chunksize=chunksize))
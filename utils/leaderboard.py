@@ -0,0 +1,188 @@
+import threading
+from bisect import bisect_left, insort
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import distinct, func, select
+from sqlalchemy.orm import Session
+
+from database import current_school
+from models import Quiz, QuizQuestion, QuizResponse, QuizResultArchive
+
+
+class ClassLeaderboard:
+    """
+    Students of one class ordered by total correct answers across its
+    quizzes. `_order` holds (-score, student_id) keys kept sorted, so rank
+    lookups are a bisect and top-k pages are a slice.
+    """
+
+    def __init__(self):
+        self._scores: Dict[int, Tuple[int, int]] = {}  # student_id -> (score, quizzes)
+        self._order: List[Tuple[int, int]] = []
+        self._lock = threading.Lock()
+        self.submissions = 0  # quizzes counted across all students
+
+    def add(self, student_id: int, score: int, quizzes: int = 1):
+        with self._lock:
+            old_score, old_quizzes = self._scores.get(student_id, (None, 0))
+            if old_score is not None:
+                del self._order[bisect_left(self._order, (-old_score, student_id))]
+            else:
+                old_score = 0
+            new_score = old_score + score
+            self._scores[student_id] = (new_score, old_quizzes + quizzes)
+            insort(self._order, (-new_score, student_id))
+            self.submissions += quizzes
+
+    def _rank(self, score: int) -> int:
+        # students with equal scores share a rank
+        return bisect_left(self._order, (-score, -1)) + 1
+
+    def rank(self, student_id: int) -> Optional[dict]:
+        with self._lock:
+            entry = self._scores.get(student_id)
+            if entry is None:
+                return None
+            score, quizzes = entry
+            return {"rank": self._rank(score), "score": score, "quizzes": quizzes}
+
+    def page(self, offset: int, limit: int) -> List[dict]:
+        with self._lock:
+            return [
+                {
+                    "rank": self._rank(-neg_score),
+                    "student_id": student_id,
+                    "score": -neg_score,
+                    "quizzes": self._scores[student_id][1],
+                }
+                for neg_score, student_id in self._order[offset:offset + limit]
+            ]
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+
+class Leaderboards:
+    """
+    Per-class leaderboards for this process, keyed by (school, class_id) so
+    tenant shards with overlapping ids stay apart. The unsharded database
+    is loaded on startup, a shard when it is opened.
+    """
+
+    def __init__(self):
+        self._boards: Dict[Tuple[Optional[str], int], ClassLeaderboard] = {}
+        self._lock = threading.Lock()
+
+    def get(self, class_id: int) -> ClassLeaderboard:
+        key = (current_school(), class_id)
+        with self._lock:
+            board = self._boards.get(key)
+            if board is None:
+                board = self._boards[key] = ClassLeaderboard()
+            return board
+
+    def current(self, db: Session, class_id: int) -> ClassLeaderboard:
+        """
+        The class's board, rebuilt first if it has missed submissions, e.g.
+        ones recorded by another worker process. Its submission total is
+        checked against the quizzes' submission_count counters.
+        """
+        board = self.get(class_id)
+        expected = db.scalar(
+            select(func.coalesce(func.sum(Quiz.submission_count), 0))
+            .where(Quiz.class_id == class_id)
+        )
+        if board.submissions != expected:
+            self.load(db, class_id)
+            board = self.get(class_id)
+        return board
+
+    def record(self, class_id: int, student_id: int, score: int, quizzes: int = 1):
+        """Apply one scored submission."""
+        self.get(class_id).add(student_id, score, quizzes)
+
+    def load(self, db: Session, class_id: Optional[int] = None):
+        """Rebuild every board of the current school, or just `class_id`'s, from the database."""
+        school = current_school()
+        boards: Dict[Tuple[Optional[str], int], ClassLeaderboard] = {}
+        for cid, student_id, score, quizzes in _class_scores(db, class_id):
+            board = boards.get((school, cid))
+            if board is None:
+                board = boards[(school, cid)] = ClassLeaderboard()
+            board.add(student_id, score, quizzes)
+
+        with self._lock:
+            if class_id is None:
+                self._drop_school(school)
+                self._boards.update(boards)
+            else:
+                self._boards[(school, class_id)] = boards.get((school, class_id), ClassLeaderboard())
+
+    def drop(self, class_id: int):
+        with self._lock:
+            self._boards.pop((current_school(), class_id), None)
+
+    def drop_school(self, school: Optional[str]):
+        with self._lock:
+            self._drop_school(school)
+
+    def _drop_school(self, school: Optional[str]):
+        for key in [k for k in self._boards if k[0] == school]:
+            del self._boards[key]
+
+
+def _class_scores(db: Session, class_id: Optional[int] = None):
+    """Yield (class_id, student_id, score, quizzes) scored like submit_quiz."""
+    def scoped(query, model):
+        if class_id is None:
+            return query
+        # seek the quiz_id indexes rather than scan and probe quizzes
+        return query.where(model.quiz_id.in_(select(Quiz.id).where(Quiz.class_id == class_id)))
+
+    # only the first response per (student, question) counts
+    first = scoped(
+        select(func.min(QuizResponse.id).label("id"))
+        .group_by(QuizResponse.quiz_id, QuizResponse.student_id, QuizResponse.question_id),
+        QuizResponse,
+    ).subquery()
+
+    correct = dict(
+        ((cid, sid), n) for cid, sid, n in db.execute(
+            select(Quiz.class_id, QuizResponse.student_id, func.count())
+            .join(first, first.c.id == QuizResponse.id)
+            .join(QuizQuestion, (QuizQuestion.id == QuizResponse.question_id)
+                  & (QuizQuestion.quiz_id == QuizResponse.quiz_id))
+            .join(Quiz, Quiz.id == QuizResponse.quiz_id)
+            .where(QuizResponse.option_id == QuizQuestion.correct_option_id)
+            .group_by(Quiz.class_id, QuizResponse.student_id)
+        )
+    )
+
+    taken = db.execute(scoped(
+        select(Quiz.class_id, QuizResponse.student_id, func.count(distinct(QuizResponse.quiz_id)))
+        .join(Quiz, Quiz.id == QuizResponse.quiz_id)
+        .group_by(Quiz.class_id, QuizResponse.student_id),
+        QuizResponse,
+    )).all()
+
+    archived = db.execute(scoped(
+        select(Quiz.class_id, QuizResultArchive.student_id,
+               func.sum(QuizResultArchive.score), func.count())
+        .join(Quiz, Quiz.id == QuizResultArchive.quiz_id)
+        .group_by(Quiz.class_id, QuizResultArchive.student_id),
+        QuizResultArchive,
+    )).all()
+
+    totals: Dict[Tuple[int, int], List[int]] = {}
+    for cid, sid, quizzes in taken:
+        totals[(cid, sid)] = [correct.get((cid, sid), 0), quizzes]
+    for cid, sid, score, quizzes in archived:
+        entry = totals.setdefault((cid, sid), [0, 0])
+        entry[0] += score or 0
+        entry[1] += quizzes
+
+    for (cid, sid), (score, quizzes) in totals.items():
+        yield cid, sid, score, quizzes
+
+
+leaderboards = Leaderboards()
@@ -0,0 +1,183 @@
+import gzip
+import hashlib
+import json
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import brotli
+import msgpack
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+
+from config import settings
+
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack")
+
+
+# ---------------- HEADER PARSING ---------------- #
+
+def _parse_q(header: str) -> dict:
+    """'gzip;q=0.8, br' -> {'gzip': 0.8, 'br': 1.0}"""
+    values = {}
+    for part in header.split(","):
+        token, *params = [p.strip() for p in part.split(";")]
+        if not token:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        values[token.lower()] = q
+    return values
+
+
+def _wants_msgpack(accept: str) -> bool:
+    accepted = _parse_q(accept)
+    mp = max(accepted.get(t, 0.0) for t in MSGPACK_TYPES)
+    return mp > 0 and mp >= accepted.get("application/json", 0.0)
+
+
+def _pick_encoding(accept_encoding: str) -> Optional[str]:
+    accepted = _parse_q(accept_encoding)
+    for encoding in ("br", "gzip"):
+        if accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+
+# ---------------- COMPRESSED BODY CACHE ---------------- #
+
+class _BodyCache:
+    """LRU of compressed bodies keyed by (representation digest, encoding)."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._items: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+
+    def get(self, key):
+        body = self._items.get(key)
+        if body is not None:
+            self._items.move_to_end(key)
+        return body
+
+    def put(self, key, body: bytes):
+        self._items[key] = body
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_entries:
+            self._items.popitem(last=False)
+
+
+def _compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=settings.brotli_quality)
+    return gzip.compress(body, compresslevel=settings.gzip_level, mtime=0)
+
+
+# ---------------- MIDDLEWARE ---------------- #
+
+class NegotiationMiddleware:
+    """
+    Re-encodes JSON responses as MessagePack when the client prefers it and
+    compresses bodies above `compression_min_size` with br/gzip. GET/HEAD
+    responses get an ETag so unchanged resources can be answered with 304.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.cache = _BodyCache(settings.compression_cache_entries)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        req = Headers(scope=scope)
+        want_msgpack = _wants_msgpack(req.get("accept", ""))
+        encoding = _pick_encoding(req.get("accept-encoding", ""))
+        # a 304 on any other method would hide a side effect that already ran
+        conditional = scope["method"] in ("GET", "HEAD")
+        if_none_match = req.get("if-none-match")
+
+        start = None
+        passthrough = False
+        parts = []
+
+        async def send_wrapper(message):
+            nonlocal start, passthrough
+
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                passthrough = (
+                    message["status"] != 200
+                    or "content-encoding" in headers
+                    or not headers.get("content-type", "").startswith("application/json")
+                )
+                if passthrough:
+                    await send(message)
+                else:
+                    start = message
+                return
+
+            if passthrough or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            parts.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+
+            await self._send_negotiated(
+                send, start, b"".join(parts), want_msgpack, encoding,
+                conditional, if_none_match,
+            )
+
+        await self.app(scope, receive, send_wrapper)
+
+    async def _send_negotiated(
+        self, send, start, body, want_msgpack, encoding, conditional, if_none_match
+    ):
+        headers = MutableHeaders(raw=list(start["headers"]))
+
+        if want_msgpack:
+            body = msgpack.packb(json.loads(body))
+            headers["content-type"] = "application/msgpack"
+
+        digest = hashlib.blake2b(body, digest_size=16).hexdigest()
+        if len(body) < settings.compression_min_size:
+            encoding = None
+        headers.append("vary", "Accept, Accept-Encoding")
+
+        if conditional:
+            etag = f'"{digest}-{encoding}"' if encoding else f'"{digest}"'
+            headers["etag"] = etag
+        if conditional and _etag_matches(if_none_match, etag):
+            del headers["content-type"]
+            del headers["content-length"]
+            await send({"type": "http.response.start", "status": 304, "headers": headers.raw})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        if encoding:
+            key = (digest, encoding)
+            compressed = self.cache.get(key)
+            if compressed is None:
+                # large bodies take milliseconds; keep them off the event loop
+                compressed = await run_in_threadpool(_compress, body, encoding)
+                self.cache.put(key, compressed)
+            body = compressed
+            headers["content-encoding"] = encoding
+
+        headers["content-length"] = str(len(body))
+        await send({"type": "http.response.start", "status": start["status"], "headers": headers.raw})
+        await send({"type": "http.response.body", "body": body})
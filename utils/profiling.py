@@ -0,0 +1,207 @@
+import asyncio
+import contextvars
+import cProfile
+import functools
+import hmac
+import io
+import os
+import pstats
+import random
+import time
+import uuid
+from typing import List, Optional, Tuple
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.concurrency import run_in_threadpool
+
+from config import settings
+
+_active: contextvars.ContextVar = contextvars.ContextVar("profile", default=None)
+
+
+class RequestProfile:
+    """Everything collected while one request runs under the profiler."""
+
+    def __init__(self, profile_id: str, method: str, path: str):
+        self.id = profile_id
+        self.method = method
+        self.path = path
+        self.endpoint: Optional[str] = None
+        self.status: Optional[int] = None
+        self.duration = 0.0
+        self.profiles: List[cProfile.Profile] = []
+        self.sql: List[Tuple[float, str]] = []
+
+
+# ---------------- ENDPOINT HOOK ---------------- #
+
+def _profiled(endpoint):
+    # cProfile only sees the thread it is enabled in, and sync endpoints run
+    # in the threadpool, so the profiler is switched on around the endpoint
+    # call itself. The request context (and with it _active) is copied into
+    # the worker thread.
+    if getattr(endpoint, "_profiled", False):
+        # include_router rebuilds routes through the same route class; nested
+        # profilers would charge the inner run to Profiler.enable
+        return endpoint
+
+    if asyncio.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            current = _active.get()
+            if current is None:
+                return await endpoint(*args, **kwargs)
+            profile = cProfile.Profile()
+            current.profiles.append(profile)
+            profile.enable()
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                profile.disable()
+    else:
+        @functools.wraps(endpoint)
+        def wrapper(*args, **kwargs):
+            current = _active.get()
+            if current is None:
+                return endpoint(*args, **kwargs)
+            profile = cProfile.Profile()
+            current.profiles.append(profile)
+            return profile.runcall(endpoint, *args, **kwargs)
+
+    wrapper._profiled = True
+    return wrapper
+
+
+class ProfiledRoute(APIRoute):
+    """Route class whose endpoint can run under cProfile for selected requests."""
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, _profiled(endpoint), **kwargs)
+
+
+# ---------------- SQL TIMINGS ---------------- #
+
+def record_sql_timings(engine: Engine):
+    """Record statement timings on `engine` for requests being profiled."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if _active.get() is not None:
+            conn.info["profile_start"] = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.pop("profile_start", None)
+        current = _active.get()
+        if current is not None and started is not None:
+            current.sql.append((time.perf_counter() - started, statement))
+
+
+# ---------------- ARTIFACTS ---------------- #
+
+def _report(current: RequestProfile, stats: Optional[pstats.Stats]) -> str:
+    out = io.StringIO()
+    out.write(f"{current.method} {current.path}\n")
+    out.write(f"endpoint: {current.endpoint}  status: {current.status}  "
+              f"duration: {current.duration * 1000:.1f} ms\n")
+
+    total_sql = sum(d for d, _ in current.sql)
+    out.write(f"\nSQL: {len(current.sql)} statements, {total_sql * 1000:.1f} ms\n")
+    for duration, statement in current.sql:
+        out.write(f"  {duration * 1000:8.2f} ms  {' '.join(statement.split())}\n")
+
+    if stats is not None:
+        stats.stream = out
+        out.write("\nPython profile (cumulative):\n")
+        stats.sort_stats("cumulative").print_stats(40)
+        out.write("\nCall tree:\n")
+        stats.print_callees(40)
+    return out.getvalue()
+
+
+def _prune(directory: str, keep: int):
+    artifacts = sorted(
+        (entry for entry in os.scandir(directory) if entry.name.endswith(".txt")),
+        key=lambda entry: entry.stat().st_mtime,
+    )
+    for entry in artifacts[:max(0, len(artifacts) - keep)]:
+        stem = entry.path[:-len(".txt")]
+        for path in (stem + ".txt", stem + ".prof"):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def save(current: RequestProfile):
+    """Write `<id>.prof` (pstats) and `<id>.txt` (SQL + call tree), then apply retention."""
+    os.makedirs(settings.profile_dir, exist_ok=True)
+    stem = os.path.join(settings.profile_dir, current.id)
+
+    stats = None
+    if current.profiles:
+        stats = pstats.Stats(current.profiles[0])
+        for profile in current.profiles[1:]:
+            stats.add(profile)
+        stats.dump_stats(stem + ".prof")
+
+    with open(stem + ".txt", "w", encoding="utf-8") as f:
+        f.write(_report(current, stats))
+
+    _prune(settings.profile_dir, settings.profile_keep)
+
+
+# ---------------- MIDDLEWARE ---------------- #
+
+def _wants_profile(scope) -> bool:
+    if settings.profile_sample_rate and random.random() < settings.profile_sample_rate:
+        return True
+
+    headers = dict(scope.get("headers") or [])
+    if headers.get(b"x-profile") != b"1" or not settings.admin_token:
+        return False
+    token = headers.get(b"x-admin-token", b"").decode("latin-1")
+    return hmac.compare_digest(token, settings.admin_token)
+
+
+class ProfilingMiddleware:
+    """
+    Profiles a request when it carries `X-Profile: 1` with a valid
+    `X-Admin-Token`, or when it is picked by `profile_sample_rate`.
+    The artifact id is returned in the `X-Profile-Id` response header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _wants_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        current = RequestProfile(
+            f"{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}",
+            scope["method"],
+            scope["path"],
+        )
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                current.status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-profile-id", current.id.encode())
+                ]
+            await send(message)
+
+        token = _active.set(current)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current.duration = time.perf_counter() - started
+            _active.reset(token)
+            endpoint = scope.get("endpoint")
+            current.endpoint = getattr(endpoint, "__name__", None)
+            await run_in_threadpool(save, current)
@@ -0,0 +1,203 @@
+import io
+import json
+from typing import Callable, Iterator, Optional, TextIO
+
+from pydantic import ValidationError
+from sqlalchemy import insert, update
+from sqlalchemy.orm import Session
+
+from models import Class, Quiz, QuizQuestion, QuizOption
+from schemas import QuizCreate
+
+CHUNK_SIZE = 64 * 1024
+MAX_DOCUMENT_BYTES = 8 * 1024 * 1024
+
+
+class ImportFormatError(ValueError):
+    pass
+
+
+# ---------------- STREAMING PARSER ---------------- #
+
+def iter_documents(stream: TextIO) -> Iterator[object]:
+    """
+    Yield JSON documents one at a time from either a top-level JSON array
+    or NDJSON / concatenated JSON, reading the stream in fixed-size chunks.
+    """
+    decoder = json.JSONDecoder()
+    buf = ""
+    pos = 0
+    eof = False
+    in_array = None
+
+    def fill() -> bool:
+        nonlocal buf, pos, eof
+        if eof:
+            return False
+        try:
+            chunk = stream.read(CHUNK_SIZE)
+        except UnicodeDecodeError as exc:
+            # reported like any other format error, after the documents read so far
+            raise ImportFormatError("File is not valid UTF-8 text") from exc
+        if not chunk:
+            eof = True
+            return False
+        buf = buf[pos:] + chunk
+        pos = 0
+        return True
+
+    def skip(chars: str):
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in chars:
+                pos += 1
+            if pos < len(buf) or not fill():
+                return
+
+    skip(" \t\r\n")
+    if pos < len(buf):
+        in_array = buf[pos] == "["
+        if in_array:
+            pos += 1
+
+    while True:
+        skip(" \t\r\n," if in_array else " \t\r\n")
+        if pos >= len(buf):
+            if in_array:
+                raise ImportFormatError("Unterminated JSON array")
+            return
+
+        if in_array and buf[pos] == "]":
+            return
+
+        while True:
+            try:
+                doc, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError as exc:
+                if len(buf) - pos > MAX_DOCUMENT_BYTES:
+                    raise ImportFormatError("Document too large") from exc
+                if not fill():
+                    raise ImportFormatError(f"Invalid JSON: {exc.msg}") from exc
+                continue
+            # a number or literal may be cut off at the chunk edge
+            if end == len(buf) and not eof and not isinstance(doc, (dict, list, str)):
+                if fill():
+                    continue
+            break
+
+        pos = end
+        yield doc
+
+
+# ---------------- BULK WRITER ---------------- #
+
+def _write_batch(db: Session, batch: list) -> list:
+    quiz_ids = db.scalars(
+        insert(Quiz).returning(Quiz.id, sort_by_parameter_order=True),
+        [
+            {"class_id": q.class_id, "title": q.title, "timer": q.timer, "status": "draft",
+             "question_count": len(q.questions)}
+            for _, q in batch
+        ],
+    ).all()
+
+    question_rows = []
+    for quiz_id, (_, q) in zip(quiz_ids, batch):
+        for question in q.questions:
+            question_rows.append({"quiz_id": quiz_id, "question_text": question.question_text})
+
+    if not question_rows:
+        return quiz_ids
+
+    question_ids = db.scalars(
+        insert(QuizQuestion).returning(QuizQuestion.id, sort_by_parameter_order=True),
+        question_rows,
+    ).all()
+
+    option_rows = []
+    for question_id, question in zip(
+        question_ids, (qq for _, q in batch for qq in q.questions)
+    ):
+        for opt in question.options:
+            option_rows.append({"question_id": question_id, "option_text": opt.option_text})
+
+    option_ids = []
+    if option_rows:
+        option_ids = db.scalars(
+            insert(QuizOption).returning(QuizOption.id, sort_by_parameter_order=True),
+            option_rows,
+        ).all()
+
+    correct = []
+    offset = 0
+    for question_id, question in zip(
+        question_ids, (qq for _, q in batch for qq in q.questions)
+    ):
+        ids = option_ids[offset:offset + len(question.options)]
+        offset += len(question.options)
+        if 0 <= question.correct_option_index < len(ids):
+            correct.append({"id": question_id, "correct_option_id": ids[question.correct_option_index]})
+
+    if correct:
+        db.execute(update(QuizQuestion), correct)
+
+    return quiz_ids
+
+
+def import_quizzes(
+    db: Session,
+    stream: TextIO,
+    teacher_id: int,
+    batch_size: int = 100,
+    on_progress: Optional[Callable[[dict], None]] = None,
+) -> dict:
+    """Validate and insert quizzes from `stream`, committing every `batch_size` quizzes."""
+    owned = {cid for (cid,) in db.query(Class.id).filter(Class.teacher_id == teacher_id).all()}
+    report = {"processed": 0, "imported": 0, "failed": 0, "batches": 0,
+              "quiz_ids": [], "errors": []}
+    batch = []
+
+    def flush():
+        if not batch:
+            return
+        report["quiz_ids"].extend(_write_batch(db, batch))
+        db.commit()
+        report["imported"] += len(batch)
+        report["batches"] += 1
+        batch.clear()
+        if on_progress:
+            on_progress(report)
+
+    def fail(index: int, doc, detail: str):
+        title = doc.get("title") if isinstance(doc, dict) else None
+        report["errors"].append({"index": index, "title": title, "detail": detail})
+        report["failed"] += 1
+
+    try:
+        for index, doc in enumerate(iter_documents(stream)):
+            report["processed"] += 1
+            try:
+                quiz = QuizCreate.model_validate(doc)
+            except ValidationError as exc:
+                err = exc.errors(include_url=False)[0]
+                loc = ".".join(str(p) for p in err["loc"])
+                fail(index, doc, f"{loc}: {err['msg']}" if loc else err["msg"])
+                continue
+
+            if quiz.class_id not in owned:
+                fail(index, doc, "Class not found or not owned by you")
+                continue
+
+            batch.append((index, quiz))
+            if len(batch) >= batch_size:
+                flush()
+    except ImportFormatError as exc:
+        report["errors"].append({"index": report["processed"], "title": None, "detail": str(exc)})
+        report["failed"] += 1
+
+    flush()
+    return report
+
+
+def open_text(binary) -> TextIO:
+    return io.TextIOWrapper(binary, encoding="utf-8-sig")
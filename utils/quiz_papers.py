@@ -0,0 +1,77 @@
+import hashlib
+import json
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from models import Quiz, QuizOption, QuizQuestion
+
+
+class QuizPaper:
+    """A live quiz's question/option tree, serialized once for every student."""
+
+    __slots__ = ("quiz_id", "class_id", "body", "etag", "_tags")
+
+    def __init__(self, quiz_id: int, class_id: int, body: bytes):
+        self.quiz_id = quiz_id
+        self.class_id = class_id
+        self.body = body
+        # same digest NegotiationMiddleware puts in its ETag, so a tag it
+        # issued for a compressed copy is also recognised here
+        digest = hashlib.blake2b(body, digest_size=16).hexdigest()
+        self.etag = f'"{digest}"'
+        self._tags = {self.etag, f'"{digest}-br"', f'"{digest}-gzip"'}
+
+    def not_modified(self, if_none_match: Optional[str]) -> bool:
+        if not if_none_match:
+            return False
+        tags = {t.strip().removeprefix("W/") for t in if_none_match.split(",")}
+        return not tags.isdisjoint(self._tags)
+
+
+def build_paper(db: Session, quiz_id: int) -> Optional[QuizPaper]:
+    """Serialize quiz `quiz_id` without correct answers; None unless it is live."""
+    quiz = db.execute(
+        select(Quiz.id, Quiz.class_id, Quiz.title, Quiz.timer)
+        .where(Quiz.id == quiz_id, Quiz.status == "live", Quiz.archived_at.is_(None))
+    ).first()
+    if quiz is None:
+        return None
+
+    questions = db.execute(
+        select(QuizQuestion.id, QuizQuestion.question_text)
+        .where(QuizQuestion.quiz_id == quiz_id)
+        .order_by(QuizQuestion.id)
+    ).all()
+
+    options = {}
+    for option_id, question_id, option_text in db.execute(
+        select(QuizOption.id, QuizOption.question_id, QuizOption.option_text)
+        .join(QuizQuestion, QuizQuestion.id == QuizOption.question_id)
+        .where(QuizQuestion.quiz_id == quiz_id)
+        .order_by(QuizOption.id)
+    ):
+        options.setdefault(question_id, []).append(
+            {"option_id": option_id, "option_text": option_text}
+        )
+
+    payload = {
+        "status": "success",
+        "data": {
+            "quiz_id": quiz.id,
+            "class_id": quiz.class_id,
+            "title": quiz.title,
+            "timer": quiz.timer,
+            "questions": [
+                {
+                    "question_id": q.id,
+                    "question_text": q.question_text,
+                    "options": options.get(q.id, []),
+                }
+                for q in questions
+            ],
+        },
+    }
+    body = json.dumps(payload, separators=(",", ":")).encode()
+    return QuizPaper(quiz.id, quiz.class_id, body)
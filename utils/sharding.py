@@ -0,0 +1,380 @@
+"""
+Tenant sharding: every school gets its own SQLite file under `shard_dir`,
+with the same schema as app.db. Requests are routed by the "school" claim
+of their token (or the X-School header on signup/login) and get_db /
+get_read_db hand out sessions bound to that shard.
+"""
+import os
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from fastapi.responses import JSONResponse
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+from starlette.concurrency import run_in_threadpool
+
+from config import settings
+from database import Base, create_read_engine, create_write_engine, current_shard
+from migrations import upgrade
+from utils.jwt_utils import decode_access_token
+from utils.leaderboard import leaderboards
+from utils.write_queue import WriteQueue
+
+SCHOOL_PATTERN = re.compile(r"^[a-z0-9][a-z0-9_-]{0,62}$")
+
+
+class UnknownSchool(LookupError):
+    pass
+
+
+def shard_path(school: str) -> str:
+    if not SCHOOL_PATTERN.match(school or ""):
+        raise UnknownSchool(school)
+    return os.path.join(settings.shard_dir, f"{school}.db")
+
+
+def list_schools() -> List[str]:
+    if not os.path.isdir(settings.shard_dir):
+        return []
+    return sorted(
+        name[:-len(".db")] for name in os.listdir(settings.shard_dir)
+        if name.endswith(".db") and SCHOOL_PATTERN.match(name[:-len(".db")])
+    )
+
+
+# ---------------- SHARD REGISTRY ---------------- #
+
+class Shard:
+    """Engines, session factories and write queue of one school's database."""
+
+    def __init__(self, school: str, path: str):
+        self.school = school
+        self.path = path
+        self.engine = create_write_engine(path)
+        self.read_engine = create_read_engine(path)
+        self.SessionLocal = sessionmaker(bind=self.engine, autoflush=False, autocommit=False)
+        self.ReadSessionLocal = sessionmaker(bind=self.read_engine, autoflush=False, autocommit=False)
+        # the writer thread only starts on the first queued write
+        self.write_queue = WriteQueue(
+            path,
+            max_batch=settings.write_queue_max_batch,
+            max_wait=settings.write_queue_max_wait_ms / 1000,
+        )
+
+    def close(self):
+        self.write_queue.close()
+        self.engine.dispose()
+        self.read_engine.dispose()
+
+
+class ShardRegistry:
+    """
+    Open shards, least recently used first; at most `max_open` stay open.
+    Opening and closing run outside the registry lock, under a per-school
+    lock, so a slow open or eviction never stalls other schools.
+    """
+
+    def __init__(self, max_open: int):
+        self.max_open = max_open
+        self._open: "OrderedDict[str, Shard]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._school_locks: Dict[str, threading.Lock] = {}
+        self.opened = 0
+        self.evicted = 0
+
+    def get_open(self, school: str) -> Optional[Shard]:
+        with self._lock:
+            shard = self._open.get(school)
+            if shard is not None:
+                self._open.move_to_end(school)
+            return shard
+
+    def _school_lock(self, school: str) -> threading.Lock:
+        with self._lock:
+            return self._school_locks.setdefault(school, threading.Lock())
+
+    def get(self, school: str, create: bool = False) -> Shard:
+        """Return the shard for `school`, opening it if needed. Raises UnknownSchool."""
+        path = shard_path(school)
+        shard = self.get_open(school)
+        if shard is not None:
+            return shard
+        if not create and not os.path.exists(path):
+            raise UnknownSchool(school)
+
+        evicted = []
+        with self._school_lock(school):
+            shard = self.get_open(school)
+            if shard is not None:
+                return shard
+
+            shard = self._open_shard(school, path)
+            with self._lock:
+                self._open[school] = shard
+                self.opened += 1
+                while len(self._open) > self.max_open:
+                    evicted.append(self._open.popitem(last=False)[1])
+                    self.evicted += 1
+
+        for old in evicted:
+            # stopping a writer can wait for its last group; don't make this request wait
+            threading.Thread(
+                target=self._close_shard, args=(old,), name="shard-close", daemon=True
+            ).start()
+        return shard
+
+    def close_all(self):
+        with self._lock:
+            closing = list(self._open.values())
+            self._open.clear()
+        for shard in closing:
+            self._close_shard(shard)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                "open": list(self._open),
+                "max_open": self.max_open,
+                "opened": self.opened,
+                "evicted": self.evicted,
+            }
+
+    def _open_shard(self, school: str, path: str) -> Shard:
+        os.makedirs(settings.shard_dir, exist_ok=True)
+        shard = Shard(school, path)
+        Base.metadata.create_all(bind=shard.engine)
+        upgrade(shard.engine)
+
+        token = current_shard.set(shard)
+        try:
+            with shard.ReadSessionLocal() as db:
+                leaderboards.load(db)
+        finally:
+            current_shard.reset(token)
+        return shard
+
+    def _close_shard(self, shard: Shard):
+        # requests still running on it fall back to direct writes
+        shard.close()
+        with self._school_lock(shard.school):
+            # the school may have been reopened, with fresh boards, meanwhile
+            with self._lock:
+                reopened = shard.school in self._open
+            if not reopened:
+                leaderboards.drop_school(shard.school)
+
+
+shards = ShardRegistry(settings.shard_max_open)
+
+
+@contextmanager
+def use_shard(school: str, create: bool = False) -> Iterator[Shard]:
+    """Route get_db, caches and run_write to `school` outside of a request."""
+    shard = shards.get(school, create=create)
+    token = current_shard.set(shard)
+    try:
+        yield shard
+    finally:
+        current_shard.reset(token)
+
+
+def query_all_shards(
+    fn: Callable[[Session], Any], schools: Optional[List[str]] = None
+) -> Dict[str, Any]:
+    """Run read-only `fn(db)` against every shard (or `schools`); returns {school: result}."""
+    results = {}
+    for school in schools or list_schools():
+        with use_shard(school) as shard, shard.ReadSessionLocal() as db:
+            results[school] = fn(db)
+    return results
+
+
+# ---------------- REQUEST ROUTING ---------------- #
+
+class MissingSchoolClaim(Exception):
+    pass
+
+
+def _school_for(scope) -> Optional[str]:
+    """
+    The school of the token's "school" claim. X-School is only honoured on
+    requests without a bearer token (signup, login): a token issued without
+    a claim must not be pointed at another school's user with the same id.
+    """
+    school = None
+    for name, value in scope.get("headers", []):
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() == "bearer" and token:
+                try:
+                    claim = decode_access_token(token).get("school")
+                except Exception:
+                    claim = None
+                if not claim:
+                    raise MissingSchoolClaim()
+                return claim
+        elif name == b"x-school":
+            school = value.decode("latin-1").strip().lower()
+    return school
+
+
+class ShardRoutingMiddleware:
+    """Binds the request to its school's shard when sharding is enabled."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.sharding_enabled:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            school = _school_for(scope)
+        except MissingSchoolClaim:
+            response = JSONResponse(
+                status_code=401,
+                content={"detail": "Token is not bound to a school, log in again"},
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+            await response(scope, receive, send)
+            return
+        if not school:
+            # routes that touch the database reject this in get_db
+            await self.app(scope, receive, send)
+            return
+
+        shard = shards.get_open(school)
+        if shard is None:
+            try:
+                shard = await run_in_threadpool(shards.get, school)
+            except UnknownSchool:
+                response = JSONResponse(status_code=404, content={"detail": "Unknown school"})
+                await response(scope, receive, send)
+                return
+
+        token = current_shard.set(shard)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_shard.reset(token)
+
+
+# ---------------- SPLITTING app.db ---------------- #
+
+# Rows each shard takes from the source, in terms of the temp id tables
+# built per school. Students are copied into every school they have a
+# class in, keeping their ids.
+_SHARD_FILTERS = {
+    "users": "id IN (SELECT id FROM shard_teachers)"
+             " OR id IN (SELECT student_id FROM src.class_members"
+             "           WHERE class_id IN (SELECT id FROM shard_classes))",
+    "classes": "id IN (SELECT id FROM shard_classes)",
+    "class_members": "class_id IN (SELECT id FROM shard_classes)",
+    "polls": "id IN (SELECT id FROM shard_polls)",
+    "poll_options": "poll_id IN (SELECT id FROM shard_polls)",
+    "poll_responses": "poll_id IN (SELECT id FROM shard_polls)",
+    "poll_tallies_archive": "poll_id IN (SELECT id FROM shard_polls)",
+    "quizzes": "id IN (SELECT id FROM shard_quizzes)",
+    "quiz_questions": "quiz_id IN (SELECT id FROM shard_quizzes)",
+    "quiz_options": "question_id IN (SELECT id FROM src.quiz_questions"
+                    " WHERE quiz_id IN (SELECT id FROM shard_quizzes))",
+    "quiz_responses": "quiz_id IN (SELECT id FROM shard_quizzes)",
+    "quiz_results_archive": "quiz_id IN (SELECT id FROM shard_quizzes)",
+    "idempotency_keys": "quiz_id IN (SELECT id FROM shard_quizzes)",
+}
+
+# students in no class at all land in the default school
+_UNENROLLED_STUDENTS = (
+    " OR (role = 'student' AND id NOT IN (SELECT student_id FROM src.class_members))"
+)
+
+
+def _copy_into_shard(path: str, source_path: str, teacher_ids: List[int], is_default: bool) -> dict:
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("ATTACH DATABASE ? AS src", (source_path,))
+        conn.execute("CREATE TEMP TABLE shard_teachers (id INTEGER PRIMARY KEY)")
+        conn.executemany("INSERT INTO shard_teachers (id) VALUES (?)", [(t,) for t in teacher_ids])
+        conn.execute("CREATE TEMP TABLE shard_classes AS SELECT id FROM src.classes"
+                     " WHERE teacher_id IN (SELECT id FROM shard_teachers)")
+        conn.execute("CREATE TEMP TABLE shard_polls AS SELECT id FROM src.polls"
+                     " WHERE class_id IN (SELECT id FROM shard_classes)")
+        conn.execute("CREATE TEMP TABLE shard_quizzes AS SELECT id FROM src.quizzes"
+                     " WHERE class_id IN (SELECT id FROM shard_classes)")
+
+        copied = {}
+        for table in Base.metadata.sorted_tables:
+            where = _SHARD_FILTERS[table.name]
+            if table.name == "users" and is_default:
+                where += _UNENROLLED_STUDENTS
+            columns = ", ".join(f'"{c.name}"' for c in table.columns)
+            cursor = conn.execute(
+                f'INSERT INTO main."{table.name}" ({columns}) '
+                f'SELECT {columns} FROM src."{table.name}" WHERE {where}'
+            )
+            copied[table.name] = cursor.rowcount
+        conn.commit()
+        return copied
+    finally:
+        conn.close()
+
+
+def split_database(
+    source_path: str,
+    assignments: Dict[str, str],
+    default_school: Optional[str] = None,
+    overwrite: bool = False,
+) -> dict:
+    """
+    Copy `source_path` into one shard per school. `assignments` maps teacher
+    email -> school; each teacher's classes go with them, and teachers not
+    listed go to `default_school` (or are reported as unassigned).
+    """
+    source = create_engine(f"sqlite:///{source_path}")
+    try:
+        Base.metadata.create_all(bind=source)
+        upgrade(source)
+    finally:
+        source.dispose()
+
+    assignments = {email.strip().lower(): school for email, school in assignments.items()}
+    with sqlite3.connect(source_path) as src:
+        teachers = src.execute("SELECT id, email FROM users WHERE role = 'teacher'").fetchall()
+
+    by_school: Dict[str, List[int]] = {}
+    unassigned = []
+    for teacher_id, email in teachers:
+        school = assignments.get(email.lower(), default_school)
+        if school is None:
+            unassigned.append(email)
+            continue
+        by_school.setdefault(school, []).append(teacher_id)
+    if default_school is not None:
+        by_school.setdefault(default_school, [])
+
+    os.makedirs(settings.shard_dir, exist_ok=True)
+    report = {"schools": {}, "unassigned_teachers": unassigned}
+    for school, teacher_ids in sorted(by_school.items()):
+        path = shard_path(school)
+        if os.path.exists(path):
+            if not overwrite:
+                raise FileExistsError(path)
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+
+        engine = create_write_engine(path)
+        try:
+            Base.metadata.create_all(bind=engine)
+        finally:
+            engine.dispose()
+
+        report["schools"][school] = _copy_into_shard(
+            path, source_path, teacher_ids, is_default=(school == default_school)
+        )
+    return report
@@ -0,0 +1,192 @@
+import contextvars
+import json
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from config import settings
+from utils.jwt_utils import decode_access_token
+
+logger = logging.getLogger("classpulse.slow_queries")
+
+# ASGI scope of the request being served, for route and role attribution
+_request: contextvars.ContextVar = contextvars.ContextVar("slow_query_request", default=None)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)+\s*\)", re.IGNORECASE)
+_EXPLAINABLE = ("SELECT", "WITH", "UPDATE", "DELETE")
+
+
+# ---------------- NORMALIZATION ---------------- #
+
+def normalize(statement: str) -> str:
+    """Collapse whitespace and literals so variants of one query share a key."""
+    sql = " ".join(statement.split())
+    sql = _STRING.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    return _IN_LIST.sub("IN (?, ...)", sql)
+
+
+def param_shape(parameters, executemany: bool):
+    """Types of the bound parameters, never their values."""
+    if executemany:
+        rows = list(parameters or [])
+        return {"rows": len(rows), "params": param_shape(rows[0], False) if rows else []}
+    if isinstance(parameters, dict):
+        return {k: type(v).__name__ for k, v in parameters.items()}
+    return [type(v).__name__ for v in parameters or ()]
+
+
+def _role(scope) -> Optional[str]:
+    for name, value in scope.get("headers", []):
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() == "bearer" and token:
+                try:
+                    return decode_access_token(token).get("role")
+                except Exception:
+                    return None
+            return None
+    return "anonymous"
+
+
+def _route(scope) -> Optional[str]:
+    route = scope.get("route")
+    return getattr(route, "path", None) or scope.get("path")
+
+
+# ---------------- AGGREGATE ---------------- #
+
+class SlowQueryLog:
+    """
+    Per-fingerprint totals of statements over the threshold, bounded to the
+    most recently seen `max_entries`. The query plan is captured the first
+    time a fingerprint is seen.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def is_new(self, sql: str) -> bool:
+        with self._lock:
+            return sql not in self._entries
+
+    def record(self, sql: str, duration_ms: float, route: Optional[str], plan: Optional[list]):
+        with self._lock:
+            entry = self._entries.pop(sql, None)
+            if entry is None:
+                entry = {"sql": sql, "count": 0, "total_ms": 0.0, "max_ms": 0.0,
+                         "routes": {}, "plan": plan}
+            entry["count"] += 1
+            entry["total_ms"] += duration_ms
+            entry["max_ms"] = max(entry["max_ms"], duration_ms)
+            key = route or "-"
+            entry["routes"][key] = entry["routes"].get(key, 0) + 1
+            self._entries[sql] = entry
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def top(self, limit: int) -> List[dict]:
+        with self._lock:
+            entries = sorted(self._entries.values(), key=lambda e: e["total_ms"], reverse=True)
+            return [
+                {**e, "total_ms": round(e["total_ms"], 2), "max_ms": round(e["max_ms"], 2),
+                 "avg_ms": round(e["total_ms"] / e["count"], 2), "routes": dict(e["routes"])}
+                for e in entries[:limit]
+            ]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+slow_query_log = SlowQueryLog(settings.slow_query_max_entries)
+
+
+# ---------------- ENGINE HOOKS ---------------- #
+
+def _explain(cursor, statement: str, parameters, executemany: bool) -> Optional[list]:
+    if not statement.lstrip().upper().startswith(_EXPLAINABLE):
+        return None
+    if executemany:
+        parameters = next(iter(parameters or []), ())
+    try:
+        plan_cursor = cursor.connection.cursor()
+        try:
+            plan_cursor.execute("EXPLAIN QUERY PLAN " + statement, parameters)
+            return [row[-1] for row in plan_cursor.fetchall()]
+        finally:
+            plan_cursor.close()
+    except Exception:
+        # the plan is a diagnostic; never let it break the query it describes
+        return None
+
+
+def log_slow_queries(engine: Engine):
+    """Log statements on `engine` slower than `slow_query_ms`."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info["slow_query_start"] = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.pop("slow_query_start", None)
+        if started is None:
+            return
+        duration_ms = (time.perf_counter() - started) * 1000
+        if duration_ms < settings.slow_query_ms:
+            return
+
+        sql = normalize(statement)
+        scope = _request.get()
+        route = _route(scope) if scope is not None else None
+        plan = _explain(cursor, statement, parameters, executemany) \
+            if slow_query_log.is_new(sql) else None
+
+        record = {
+            "event": "slow_query",
+            "sql": sql,
+            "params": param_shape(parameters, executemany),
+            "duration_ms": round(duration_ms, 2),
+            "route": route,
+            "method": scope.get("method") if scope is not None else None,
+            "role": _role(scope) if scope is not None else None,
+        }
+        if plan is not None:
+            record["plan"] = plan
+        logger.warning(json.dumps(record))
+        slow_query_log.record(sql, duration_ms, route, plan)
+
+
+# ---------------- MIDDLEWARE ---------------- #
+
+class SlowQueryContextMiddleware:
+    """
+    Exposes the current request to the engine hooks. Route and role are
+    only resolved when a slow statement is actually logged.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = _request.set(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request.reset(token)
@@ -0,0 +1,190 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional
+
+from sqlalchemy.orm import Session, sessionmaker
+
+from config import settings
+from database import create_write_engine, current_shard
+
+# A write unit does its ORM work against the session it is given and
+# returns plain data. It must not commit: the writer commits for it.
+WriteUnit = Callable[[Session], Any]
+
+
+class WriteQueueClosed(RuntimeError):
+    """The queue was closed for good (its shard was evicted); write directly instead."""
+
+
+class _Item:
+    __slots__ = ("fn", "future")
+
+    def __init__(self, fn: WriteUnit):
+        self.fn = fn
+        self.future: Future = Future()
+
+
+class WriteQueue:
+    """
+    One dedicated writer thread that drains queued write units and commits
+    them in groups. Each unit runs in its own SAVEPOINT so a failing unit
+    is rolled back alone; the rest of the group still commits together.
+    """
+
+    def __init__(self, path: str, max_batch: int, max_wait: float):
+        self.path = path
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue: "queue.Queue[Optional[_Item]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.closed = False
+
+        self.units = 0
+        self.batches = 0
+        self.failed_commits = 0
+
+    # ---------------- LIFECYCLE ---------------- #
+
+    def start(self):
+        with self._lock:
+            self._start()
+
+    def _start(self):
+        if self.closed:
+            raise WriteQueueClosed(self.path)
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="write-queue", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join(timeout)
+
+    def close(self, timeout: float = 10.0):
+        """Stop for good: later submissions raise WriteQueueClosed instead of restarting it."""
+        with self._lock:
+            self.closed = True
+        self.stop(timeout)
+
+    # ---------------- SUBMISSION ---------------- #
+
+    def submit(self, fn: WriteUnit) -> Future:
+        item = _Item(fn)
+        # under the lock, so nothing lands behind close()'s stop sentinel
+        with self._lock:
+            self._start()
+            self._queue.put(item)
+        return item.future
+
+    def run(self, fn: WriteUnit, timeout: Optional[float] = None) -> Any:
+        """Enqueue `fn` and block until its group has committed."""
+        return self.submit(fn).result(timeout or settings.write_queue_timeout)
+
+    def metrics(self) -> dict:
+        return {
+            "queue_depth": self._queue.qsize(),
+            "units": self.units,
+            "batches": self.batches,
+            "avg_batch_size": (self.units / self.batches) if self.batches else 0,
+            "failed_commits": self.failed_commits,
+        }
+
+    # ---------------- WRITER THREAD ---------------- #
+
+    def _run(self):
+        engine = create_write_engine(self.path, explicit_begin=True)
+        factory = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+        db = factory()
+        stopping = False
+
+        try:
+            while not stopping:
+                first = self._queue.get()
+                if first is None:
+                    break
+
+                # take whatever queued up during the previous commit, then
+                # optionally linger up to max_wait for stragglers
+                batch = [first]
+                deadline = time.monotonic() + self.max_wait
+                while len(batch) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    try:
+                        if remaining > 0:
+                            item = self._queue.get(timeout=remaining)
+                        else:
+                            item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        stopping = True
+                        break
+                    batch.append(item)
+
+                self._commit_group(db, batch)
+        finally:
+            db.close()
+            engine.dispose()
+
+    def _commit_group(self, db: Session, batch: List[_Item]):
+        outcomes = []
+        for item in batch:
+            if not item.future.set_running_or_notify_cancel():
+                continue
+            savepoint = db.begin_nested()
+            try:
+                value = item.fn(db)
+                savepoint.commit()
+                outcomes.append((item, value, None))
+            except BaseException as exc:
+                savepoint.rollback()
+                outcomes.append((item, None, exc))
+
+        try:
+            db.commit()
+        except Exception as exc:
+            db.rollback()
+            self.failed_commits += 1
+            outcomes = [(item, None, err or exc) for item, _, err in outcomes]
+        finally:
+            db.expunge_all()
+
+        self.batches += 1
+        self.units += len(outcomes)
+        for item, value, err in outcomes:
+            if err is not None:
+                item.future.set_exception(err)
+            else:
+                item.future.set_result(value)
+
+
+write_queue = WriteQueue(
+    settings.database_path,
+    max_batch=settings.write_queue_max_batch,
+    max_wait=settings.write_queue_max_wait_ms / 1000,
+)
+
+
+def run_write(db: Session, fn: WriteUnit) -> Any:
+    """
+    Run a write unit and commit it: through the group-commit writer when
+    `write_queue_enabled` is set, otherwise directly on the request session.
+    A request bound to a tenant shard uses that shard's writer; if the shard
+    was evicted mid-request its writer is closed and the write goes direct.
+    """
+    if settings.write_queue_enabled:
+        shard = current_shard.get()
+        try:
+            return (shard.write_queue if shard is not None else write_queue).run(fn)
+        except WriteQueueClosed:
+            pass
+
+    value = fn(db)
+    db.commit()
+    return value